@@ -4,6 +4,7 @@ from django.contrib.auth.forms import UserCreationForm
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Fieldset, Row, Column, Submit, Button
 from .models import UserProfile
+from blog.caching import invalidate_all_pages
 
 
 class UserRegistrationForm(UserCreationForm):
@@ -165,4 +166,7 @@ class UserProfileForm(forms.ModelForm):
         if commit:
             self.user.save()
             profile.save()
+            if {'first_name', 'last_name'} & set(self.changed_data) and self.user.blog_posts.exists():
+                # Post pages and cached post cards show the author's name
+                invalidate_all_pages()
         return profile
@@ -10,7 +10,11 @@ from django.urls import reverse_lazy
 from django.db.models import Q
 from .forms import UserRegistrationForm, UserLoginForm, UserProfileForm
 from .models import UserProfile
-from blog.models import Post, UserActivity
+from blog.models import Post
+from blog.activity import record_activity
+from blog.counts import get_author_stats
+from blog.rollups import author_daily_series
+from blog.pagination import CursorPaginationMixin
 
 
 class RegisterView(View):
@@ -52,12 +56,7 @@ class LoginView(View):
             if user is not None:
                 login(request, user)
                 # Record user activity
-                UserActivity.objects.create(
-                    user=user,
-                    activity_type='login',
-                    ip_address=self.get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
-                )
+                record_activity(user, 'login', request=request)
                 
                 next_page = request.GET.get('next', 'blog:home')
                 messages.success(request, f'Welcome back, {user.username}!')
@@ -67,26 +66,12 @@ class LoginView(View):
         
         return render(request, 'accounts/login.html', {'form': form})
 
-    @staticmethod
-    def get_client_ip(request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-
 
 class LogoutView(View):
     """User logout view"""
     def get(self, request):
         if request.user.is_authenticated:
-            UserActivity.objects.create(
-                user=request.user,
-                activity_type='logout',
-                ip_address=LoginView.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
+            record_activity(request.user, 'logout', request=request)
         logout(request)
         messages.success(request, 'You have been logged out successfully.')
         return redirect('blog:home')
@@ -107,7 +92,7 @@ class ProfileDetailView(DetailView):
         user = self.request.user
         context['user_posts'] = user.blog_posts.all()
         context['user_comments'] = user.comments.all()
-        context['user_activity'] = user.activities.all()[:10]
+        context['user_activity'] = user.activities.select_related('post')[:10]
         return context
 
 
@@ -133,30 +118,26 @@ class ProfileUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name='dispatch')
-class AuthorDashboardView(ListView):
+class AuthorDashboardView(CursorPaginationMixin, ListView):
     """Dashboard for authors to manage their posts"""
     model = Post
     template_name = 'accounts/dashboard.html'
     context_object_name = 'posts'
     paginate_by = 10
+    # Drafts have no published_at, so page through the author's posts by creation
+    cursor_fields = ('created_at', 'id')
 
     def get_queryset(self):
         user = self.request.user
         if not user.profile.is_author():
             messages.error(self.request, 'You do not have permission to access the dashboard.')
             return Post.objects.none()
-        return user.blog_posts.all().prefetch_related('comments', 'tags')
+        return user.blog_posts.all()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        context['stats'] = {
-            'total_posts': user.blog_posts.count(),
-            'published_posts': user.blog_posts.filter(status='published').count(),
-            'draft_posts': user.blog_posts.filter(status='draft').count(),
-            'total_comments': user.blog_posts.values_list('comments', flat=True).count(),
-            'total_views': sum(post.views_count for post in user.blog_posts.all()),
-        }
+        context['stats'] = get_author_stats(self.request.user)
+        context['daily_stats'] = author_daily_series(self.request.user)
         return context
 
 
@@ -0,0 +1,243 @@
+"""User activity recording.
+
+Views call :func:`record_activity` instead of creating ``UserActivity`` rows
+themselves. The configured sink decides when the row is written:
+
+* ``'queued'`` (default) puts the row on an in-process queue that a
+  background thread drains with ``bulk_create`` once
+  ``BLOG_ACTIVITY_BATCH_SIZE`` rows are waiting or
+  ``BLOG_ACTIVITY_FLUSH_INTERVAL`` seconds have passed.
+  A batch that fails to write (e.g. "database is locked") is kept and
+  retried with the next one, up to ``MAX_WRITE_ATTEMPTS`` times; after
+  that it is logged and dropped, as is whatever is still queued when the
+  process is killed.
+* ``'sync'`` writes the row immediately, which is what tests want.
+
+User-Agent headers are stored once each in ``UserAgent``; the writer maps
+a batch's headers to their ids with one lookup, memoized per process.
+"""
+import atexit
+import hashlib
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def get_client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
+
+USER_AGENT_CACHE_SIZE = 5000
+# Flush intervals a failed batch is carried over before it is dropped
+MAX_WRITE_ATTEMPTS = 5
+
+_user_agent_ids = {}
+
+
+def user_agent_hash(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def get_user_agent_ids(values):
+    """Map User-Agent strings to ``UserAgent`` ids, creating missing rows"""
+    from .models import UserAgent
+
+    hashes = {value: user_agent_hash(value) for value in set(values) if value}
+    ids = {value: _user_agent_ids[digest] for value, digest in hashes.items() if digest in _user_agent_ids}
+    missing = {digest: value for value, digest in hashes.items() if value not in ids}
+    if missing:
+        UserAgent.objects.bulk_create(
+            [UserAgent(value=value, value_hash=digest) for digest, value in missing.items()],
+            ignore_conflicts=True,
+        )
+        found = dict(UserAgent.objects.filter(value_hash__in=missing).values_list('value_hash', 'pk'))
+        if len(_user_agent_ids) + len(found) > USER_AGENT_CACHE_SIZE:
+            _user_agent_ids.clear()
+        _user_agent_ids.update(found)
+        ids.update((missing[digest], pk) for digest, pk in found.items())
+    return ids
+
+
+def write_activities(activities):
+    """Insert a batch of unsaved ``UserActivity`` objects"""
+    from .models import UserActivity
+
+    user_agents = [getattr(activity, 'user_agent_value', '') for activity in activities]
+    if any(user_agents):
+        user_agent_ids = get_user_agent_ids(user_agents)
+        for activity, value in zip(activities, user_agents):
+            activity.user_agent_id = user_agent_ids.get(value)
+
+    try:
+        with transaction.atomic():
+            UserActivity.objects.bulk_create(activities)
+    except IntegrityError:
+        # A referenced post or user was deleted before the batch was written;
+        # save the rows one by one so the rest of the batch survives.
+        for activity in activities:
+            try:
+                with transaction.atomic():
+                    activity.save(force_insert=True)
+            except IntegrityError:
+                logger.warning('Dropped activity %s for user %s', activity.activity_type, activity.user_id)
+
+
+class SyncActivitySink:
+    """Write each activity inside the request"""
+
+    def record(self, activity):
+        write_activities([activity])
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class QueuedActivitySink:
+    """Buffer activities and write them in batches from a background thread"""
+
+    def __init__(self, batch_size, flush_interval, max_queue_size):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._failures = 0
+
+    def record(self, activity):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(activity)
+        except queue.Full:
+            # Don't drop events when the writer falls behind: write this one
+            # synchronously instead
+            write_activities([activity])
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            write_activities(batch)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='activity-sink', daemon=True
+                )
+                self._thread.start()
+
+    def close(self, timeout=5):
+        """Stop the worker, letting it write the batch it is holding"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                batch = self._write(batch)
+                deadline = time.monotonic() + self.flush_interval
+        self._write(batch)
+
+    def _write(self, batch):
+        """Write ``batch``; return the rows to try again with the next batch"""
+        if not batch:
+            return []
+        close_old_connections()
+        try:
+            write_activities(batch)
+        except Exception:
+            self._failures += 1
+            if self._failures >= MAX_WRITE_ATTEMPTS:
+                logger.exception('Dropped %d activities after %d failed writes', len(batch), self._failures)
+                self._failures = 0
+                return []
+            logger.exception('Failed to write %d activities; retrying', len(batch))
+            for activity in batch:
+                # The failed insert may have assigned ids before rolling back
+                activity.pk = None
+            return batch
+        self._failures = 0
+        return []
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_activity_sink():
+    """Return the sink selected by ``BLOG_ACTIVITY_SINK``"""
+    name = getattr(settings, 'BLOG_ACTIVITY_SINK', 'queued')
+    sink = _sinks.get(name)
+    if sink is None:
+        with _sinks_lock:
+            sink = _sinks.get(name)
+            if sink is None:
+                if name == 'sync':
+                    sink = SyncActivitySink()
+                else:
+                    sink = QueuedActivitySink(
+                        batch_size=getattr(settings, 'BLOG_ACTIVITY_BATCH_SIZE', 100),
+                        flush_interval=getattr(settings, 'BLOG_ACTIVITY_FLUSH_INTERVAL', 2.0),
+                        max_queue_size=getattr(settings, 'BLOG_ACTIVITY_MAX_QUEUE_SIZE', 10000),
+                    )
+                _sinks[name] = sink
+    return sink
+
+
+def record_activity(user, activity_type, post=None, request=None):
+    """Record a ``UserActivity`` event through the configured sink.
+
+    When ``request`` is given its client IP and user agent are stored too.
+    """
+    from .models import UserActivity
+
+    activity = UserActivity(
+        user_id=user.pk,
+        activity_type=activity_type,
+        post_id=post.pk if post is not None else None,
+    )
+    if request is not None:
+        activity.ip_address = get_client_ip(request)
+        # Resolved to a UserAgent row by the writer
+        activity.user_agent_value = request.META.get('HTTP_USER_AGENT', '')
+    get_activity_sink().record(activity)
+
+
+@atexit.register
+def _flush_on_exit():
+    for sink in list(_sinks.values()):
+        try:
+            sink.close()
+        except Exception:
+            pass
@@ -1,57 +1,58 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Category, Tag, Post, Comment, UserActivity
+from .models import (
+    Category, Tag, Post, Comment, UserActivity, UserAgent, OutboxNotification, AuthorStats,
+    DailyPostStats, DailyAuthorStats,
+)
+from .caching import invalidate_post_pages
+from .counts import refresh_comment_counts, refresh_post_author_stats
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     """Admin for Category model"""
-    list_display = ('name', 'slug', 'post_count', 'created_at')
+    list_display = ('name', 'slug', 'published_post_count', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('name', 'slug')
     prepopulated_fields = {'slug': ('name',)}
     ordering = ('-created_at',)
-
-    def post_count(self, obj):
-        return obj.posts.count()
-    post_count.short_description = 'Number of Posts'
+    readonly_fields = ('published_post_count',)
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     """Admin for Tag model"""
-    list_display = ('name', 'slug', 'post_count', 'created_at')
+    list_display = ('name', 'slug', 'published_post_count', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('name', 'slug')
     prepopulated_fields = {'slug': ('name',)}
     ordering = ('-created_at',)
-
-    def post_count(self, obj):
-        return obj.posts.count()
-    post_count.short_description = 'Number of Posts'
+    readonly_fields = ('published_post_count',)
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     """Admin for Post model"""
-    list_display = ('title', 'author', 'category', 'status_badge', 'views_count', 'published_at')
+    list_display = ('title', 'author', 'category', 'status_badge', 'views_count', 'approved_comment_count', 'published_at')
     list_filter = ('status', 'category', 'created_at', 'published_at')
+    list_select_related = ('author', 'category')
     search_fields = ('title', 'slug', 'content', 'author__username')
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ('views_count', 'created_at', 'updated_at', 'published_at')
+    readonly_fields = ('views_count', 'approved_comment_count', 'created_at', 'updated_at', 'published_at')
     filter_horizontal = ('tags',)
     fieldsets = (
         ('Post Information', {
             'fields': ('title', 'slug', 'author', 'category')
         }),
         ('Content', {
-            'fields': ('excerpt', 'content', 'featured_image')
+            'fields': ('excerpt', 'content', 'content_format', 'featured_image')
         }),
         ('Meta', {
             'fields': ('tags',)
         }),
         ('Status & Dates', {
-            'fields': ('status', 'views_count', 'created_at', 'updated_at', 'published_at')
+            'fields': ('status', 'views_count', 'approved_comment_count', 'created_at', 'updated_at', 'published_at')
         }),
     )
     ordering = ('-published_at', '-created_at')
@@ -77,6 +78,7 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ('user', 'post', 'status_badge', 'created_at')
     list_filter = ('status', 'created_at', 'post')
     search_fields = ('content', 'user__username', 'post__title')
+    raw_id_fields = ('parent',)
     readonly_fields = ('created_at', 'updated_at')
     actions = ['approve_comments', 'reject_comments']
     ordering = ('-created_at',)
@@ -95,13 +97,23 @@ class CommentAdmin(admin.ModelAdmin):
         )
     status_badge.short_description = 'Status'
 
+    def _moderate(self, queryset, status):
+        # QuerySet.update() bypasses the Comment signals
+        post_ids = set(queryset.values_list('post_id', flat=True))
+        updated = queryset.update(status=status, updated_at=timezone.now())
+        refresh_comment_counts(post_ids)
+        refresh_post_author_stats(post_ids)
+        for post in Post.objects.filter(pk__in=post_ids, status='published'):
+            invalidate_post_pages(post)
+        return updated
+
     def approve_comments(self, request, queryset):
-        updated = queryset.update(status='approved')
+        updated = self._moderate(queryset, 'approved')
         self.message_user(request, f'{updated} comment(s) approved.')
     approve_comments.short_description = 'Approve selected comments'
 
     def reject_comments(self, request, queryset):
-        updated = queryset.update(status='rejected')
+        updated = self._moderate(queryset, 'rejected')
         self.message_user(request, f'{updated} comment(s) rejected.')
     reject_comments.short_description = 'Reject selected comments'
 
@@ -111,6 +123,7 @@ class UserActivityAdmin(admin.ModelAdmin):
     """Admin for UserActivity model"""
     list_display = ('user', 'activity_type', 'post', 'ip_address', 'created_at')
     list_filter = ('activity_type', 'created_at', 'user')
+    list_select_related = ('user', 'post')
     search_fields = ('user__username', 'post__title', 'ip_address')
     readonly_fields = ('user', 'activity_type', 'post', 'ip_address', 'user_agent', 'created_at')
     ordering = ('-created_at',)
@@ -120,3 +133,77 @@ class UserActivityAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser
+
+
+@admin.register(UserAgent)
+class UserAgentAdmin(admin.ModelAdmin):
+    """Admin for UserAgent model"""
+    list_display = ('value', 'created_at')
+    search_fields = ('value',)
+    readonly_fields = ('value', 'value_hash', 'created_at')
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxNotification)
+class OutboxNotificationAdmin(admin.ModelAdmin):
+    """Admin for queued email notifications"""
+    list_display = ('kind', 'post', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('kind', 'status', 'created_at')
+    search_fields = ('post__title', 'last_error')
+    readonly_fields = ('kind', 'post', 'attempts', 'last_error', 'claim_token', 'claimed_at', 'created_at', 'sent_at')
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(admin.ModelAdmin):
+    """Admin for maintained author dashboard totals"""
+    list_display = ('author', 'total_posts', 'published_posts', 'draft_posts', 'total_views', 'total_comments', 'updated_at')
+    search_fields = ('author__username',)
+    readonly_fields = ('author', 'total_posts', 'published_posts', 'draft_posts', 'total_views', 'total_comments', 'updated_at')
+    ordering = ('-total_views',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DailyPostStats)
+class DailyPostStatsAdmin(admin.ModelAdmin):
+    """Admin for daily per-post activity rollups"""
+    list_display = ('post', 'date', 'views', 'unique_viewers', 'comments', 'edits')
+    list_filter = ('date',)
+    search_fields = ('post__title',)
+    list_select_related = ('post',)
+    date_hierarchy = 'date'
+    ordering = ('-date', '-views')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyAuthorStats)
+class DailyAuthorStatsAdmin(admin.ModelAdmin):
+    """Admin for daily per-author activity rollups"""
+    list_display = ('author', 'date', 'views', 'unique_viewers', 'comments', 'edits')
+    list_filter = ('date',)
+    search_fields = ('author__username',)
+    list_select_related = ('author',)
+    date_hierarchy = 'date'
+    ordering = ('-date', '-views')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
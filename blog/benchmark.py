@@ -0,0 +1,456 @@
+"""Synthetic data and throughput benchmarks.
+
+:func:`seed_benchmark_data` fills the database with generated users,
+posts, tags, comments and activity, written with ``bulk_create`` in
+batches so that millions of rows take minutes rather than hours. Every
+generated object is named after ``prefix`` (users ``bench-user-42``, posts
+``bench-post-42``...), which lets :func:`clear_benchmark_data` remove them
+again. Popularity is skewed the way real blogs are: a few tags are on most
+posts and a few posts get most comments and views (Zipf weights).
+
+:func:`run_benchmark` requests the main pages of ``blog.urls`` and
+``accounts.urls`` from several threads, either through Django's test
+client or over HTTP against a local WSGI server, and reports latency
+percentiles, requests per second and queries per request. The query
+counts come from the ``Server-Timing`` header added by
+``UserActivityMiddleware``. Results are saved as JSON and
+:func:`compare_results` flags regressions against a saved baseline.
+"""
+import datetime
+import http.client
+import json
+import random
+import socketserver
+import statistics
+import threading
+import time
+from itertools import islice
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserProfile
+
+from .activity import get_user_agent_ids
+from .caching import invalidate_all_pages, invalidate_search_results, invalidate_sidebar
+from .counts import recount_all
+from .models import Category, Comment, Post, Tag, UserActivity
+from .rendering import PLAIN, content_hash, render_content
+from .search import get_search_backend
+
+WORDS = (
+    'django python database query index cache template view model form '
+    'migration server request response latency throughput sqlite postgres '
+    'replica signal middleware static image search tag category comment '
+    'author reader profile dashboard session cookie deploy backup monitor '
+    'performance profile benchmark batch queue worker thread process memory'
+).split()
+USER_AGENTS = [
+    f'Mozilla/5.0 ({platform}) AppleWebKit/537.36 (KHTML, like Gecko) {browser}'
+    for platform in (
+        'Windows NT 10.0; Win64; x64', 'Macintosh; Intel Mac OS X 10_15_7',
+        'X11; Linux x86_64', 'iPhone; CPU iPhone OS 17_4 like Mac OS X',
+        'Linux; Android 14; Pixel 8',
+    )
+    for browser in (
+        'Chrome/124.0.0.0 Safari/537.36', 'Version/17.4 Safari/605.1.15',
+        'Firefox/125.0', 'Edg/124.0.0.0',
+    )
+]
+SEED_PASSWORD = 'benchmark'
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative weights giving rank ``n`` a share proportional to ``1 / n ** exponent``"""
+    total, cumulative = 0.0, []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _bulk_create(model, objects, batch_size, log=None):
+    created = 0
+    for batch in batched(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        created += len(batch)
+        if log and created % (batch_size * 20) == 0:
+            log(f'  {created} {model.__name__} rows...')
+    return created
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def clear_benchmark_data(prefix='bench'):
+    """Delete everything created by :func:`seed_benchmark_data` with ``prefix``.
+
+    Comments and posts are deleted one by one through their signal
+    receivers, so clearing a large data set takes much longer than seeding
+    it; start from an empty database for big runs instead.
+    """
+    users = User.objects.filter(username__startswith=f'{prefix}-user-')
+    # Activity has no receivers, so this is a single DELETE
+    UserActivity.objects.filter(user__in=users).delete()
+    deleted = {
+        'users': users.delete()[1].get(User._meta.label, 0),
+        'categories': Category.objects.filter(slug__startswith=f'{prefix}-category-').delete()[0],
+        'tags': Tag.objects.filter(slug__startswith=f'{prefix}-tag-').delete()[0],
+    }
+    recount_all()
+    get_search_backend().rebuild()
+    invalidate_all_pages()
+    invalidate_sidebar()
+    invalidate_search_results()
+    return deleted
+
+
+def seed_benchmark_data(posts=1000, comments=10000, activities=100000, users=200,
+                        categories=20, tags=200, days=90, prefix='bench', batch_size=5000,
+                        seed=0, log=None):
+    """Generate benchmark data; return the number of rows created per model"""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    counts = {}
+
+    def random_time():
+        return now - datetime.timedelta(seconds=rng.randint(0, days * 86400))
+
+    log(f'Creating {users} users...')
+    password = make_password(SEED_PASSWORD)
+    counts['users'] = _bulk_create(User, (
+        User(username=f'{prefix}-user-{n}', email=f'{prefix}-user-{n}@example.com', password=password)
+        for n in range(users)
+    ), batch_size)
+    user_ids = list(
+        User.objects.filter(username__startswith=f'{prefix}-user-').order_by('pk').values_list('pk', flat=True)
+    )
+    # One in ten users writes
+    author_ids = user_ids[::10]
+    authors = set(author_ids)
+    _bulk_create(UserProfile, (
+        UserProfile(user_id=pk, role='author' if pk in authors else 'reader') for pk in user_ids
+    ), batch_size)
+
+    log(f'Creating {categories} categories and {tags} tags...')
+    counts['categories'] = _bulk_create(Category, (
+        Category(name=f'{prefix.title()} category {n}', slug=f'{prefix}-category-{n}') for n in range(categories)
+    ), batch_size)
+    counts['tags'] = _bulk_create(Tag, (
+        Tag(name=f'{prefix}-{rng.choice(WORDS)}-{n}', slug=f'{prefix}-tag-{n}') for n in range(tags)
+    ), batch_size)
+    category_ids = list(Category.objects.filter(slug__startswith=f'{prefix}-category-').values_list('pk', flat=True))
+    tag_ids = list(Tag.objects.filter(slug__startswith=f'{prefix}-tag-').order_by('pk').values_list('pk', flat=True))
+
+    log(f'Creating {posts} posts...')
+    view_weights = zipf_weights(posts)
+    scale = 50000 / view_weights[0]
+
+    def post_objects():
+        for n in range(posts):
+            content = '\n\n'.join(_sentence(rng, rng.randint(30, 90)) for _ in range(rng.randint(2, 6)))
+            published = rng.random() < 0.85
+            yield Post(
+                title=f'{_sentence(rng, rng.randint(3, 7)).capitalize()} {n}',
+                slug=f'{prefix}-post-{n}',
+                content=content,
+                content_format=PLAIN,
+                content_html=render_content(content, PLAIN),
+                content_hash=content_hash(content, PLAIN),
+                excerpt=_sentence(rng, 20)[:300],
+                author_id=rng.choice(author_ids),
+                category_id=rng.choice(category_ids),
+                status='published' if published else 'draft',
+                published_at=random_time() if published else None,
+                views_count=int(scale / (n + 1) ** 1.1) + rng.randint(0, 20),
+            )
+
+    counts['posts'] = _bulk_create(Post, post_objects(), batch_size, log)
+    post_ids = list(
+        Post.objects.filter(slug__startswith=f'{prefix}-post-').order_by('pk').values_list('pk', flat=True)
+    )
+
+    log('Tagging posts...')
+    tag_weights = zipf_weights(len(tag_ids))
+    Through = Post.tags.through
+    counts['post_tags'] = _bulk_create(Through, (
+        Through(post_id=post_id, tag_id=tag_id)
+        for post_id in post_ids
+        for tag_id in set(rng.choices(tag_ids, cum_weights=tag_weights, k=rng.randint(1, 5)))
+    ), batch_size)
+
+    log(f'Creating {comments} comments...')
+    statuses = ['approved'] * 17 + ['pending'] * 2 + ['rejected']
+    counts['comments'] = _bulk_create(Comment, (
+        Comment(
+            post_id=rng.choices(post_ids, cum_weights=view_weights)[0],
+            user_id=rng.choice(user_ids),
+            content=_sentence(rng, rng.randint(5, 40)),
+            status=rng.choice(statuses),
+        )
+        for _ in range(comments)
+    ), batch_size, log)
+
+    # About a third of the approved comments answer an earlier one
+    threads, replies = {}, []
+    approved = Comment.objects.filter(post_id__in=post_ids, status='approved').order_by('pk')
+    for comment_id, post_id in approved.values_list('pk', 'post_id').iterator():
+        if post_id in threads and rng.random() < 0.3:
+            replies.append(Comment(pk=comment_id, parent_id=rng.choice(threads[post_id])))
+        else:
+            threads.setdefault(post_id, []).append(comment_id)
+    Comment.objects.bulk_update(replies, ['parent'], batch_size=batch_size)
+    counts['replies'] = len(replies)
+
+    log(f'Creating {activities} activity rows...')
+    agent_ids = list(get_user_agent_ids(USER_AGENTS).values())
+    activity_types = ['view_post'] * 90 + ['comment_post'] * 6 + ['edit_post'] * 2 + ['login'] * 2
+    counts['activities'] = _bulk_create(UserActivity, (
+        UserActivity(
+            user_id=rng.choice(user_ids),
+            activity_type=activity_type,
+            post_id=rng.choices(post_ids, cum_weights=view_weights)[0] if activity_type != 'login' else None,
+            ip_address=f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+            user_agent_id=rng.choice(agent_ids),
+            created_at=random_time(),
+        )
+        for activity_type in (rng.choice(activity_types) for _ in range(activities))
+    ), batch_size, log)
+
+    log('Refreshing counters and the search index...')
+    recount_all()
+    get_search_backend().rebuild()
+    invalidate_all_pages()
+    invalidate_sidebar()
+    invalidate_search_results()
+    return counts
+
+
+def benchmark_urls(prefix='bench'):
+    """The pages to benchmark as ``(url name, path, username to log in as)``"""
+    posts = Post.objects.filter(status='published')
+    seeded = posts.filter(slug__startswith=f'{prefix}-post-')
+    post = (seeded if seeded.exists() else posts).order_by('-views_count').first()
+    if post is None:
+        raise ValueError('No published posts to benchmark; run seed_benchmark_data first.')
+    tag = post.tags.order_by('-published_post_count').first()
+    reader = User.objects.filter(profile__role='reader').exclude(pk=post.author_id).order_by('pk').first()
+    author = post.author.username
+    word = post.title.split()[0].lower()
+
+    urls = [
+        ('blog:home', reverse('blog:home'), None),
+        ('blog:home (signed in)', reverse('blog:home'), reader.username if reader else author),
+        ('blog:search', f'{reverse("blog:search")}?query={word}', None),
+        ('blog:post_detail', reverse('blog:post_detail', args=[post.slug]), None),
+        ('blog:post_detail (signed in)', reverse('blog:post_detail', args=[post.slug]), reader.username if reader else author),
+        ('blog:post_create', reverse('blog:post_create'), author),
+        ('blog:post_edit', reverse('blog:post_edit', args=[post.slug]), author),
+        ('accounts:login', reverse('accounts:login'), None),
+        ('accounts:register', reverse('accounts:register'), None),
+        ('accounts:profile', reverse('accounts:profile'), author),
+        ('accounts:dashboard', reverse('accounts:dashboard'), author),
+    ]
+    if post.category is not None:
+        urls.append(('blog:category_posts', reverse('blog:category_posts', args=[post.category.slug]), None))
+    if tag is not None:
+        urls.append(('blog:tag_posts', reverse('blog:tag_posts', args=[tag.slug]), None))
+    return urls
+
+
+def _session_cookie(username):
+    client = Client()
+    client.force_login(User.objects.get(username=username))
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def _server_timing_queries(header):
+    # db;dur=1.2;desc="8 queries", ...
+    for entry in (header or '').split(','):
+        if entry.strip().startswith('db;') and 'desc="' in entry:
+            return int(entry.split('desc="')[1].split()[0])
+    return None
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')]
+    return 'localhost' if 'localhost' in hosts or not hosts else hosts[0]
+
+
+def _client_fetcher(cookie):
+    client = Client(HTTP_HOST=_host())
+    if cookie:
+        client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+
+    def fetch(path):
+        response = client.get(path)
+        return response.status_code, response.get('Server-Timing')
+    return fetch
+
+
+def _http_fetcher(port, cookie):
+    headers = {'Host': _host()}
+    if cookie:
+        headers['Cookie'] = f'{settings.SESSION_COOKIE_NAME}={cookie}'
+    http_connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def fetch(path):
+        http_connection.request('GET', path, headers=headers)
+        response = http_connection.getresponse()
+        response.read()
+        return response.status, response.getheader('Server-Timing')
+    return fetch
+
+
+def _measure(make_fetcher, path, requests, concurrency, warmup):
+    samples, statuses, queries = [], {}, []
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def worker():
+        fetch = make_fetcher()
+        for _ in range(warmup):
+            fetch(path)
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    break
+            started = time.perf_counter()
+            status, timing = fetch(path)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                count = _server_timing_queries(timing)
+                if count is not None:
+                    queries.append(count)
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    samples.sort()
+
+    def percentile(percent):
+        return round(samples[min(len(samples) - 1, int(len(samples) * percent / 100))], 2)
+
+    return {
+        'path': path,
+        'requests': len(samples),
+        'status_codes': {str(status): count for status, count in sorted(statuses.items())},
+        'rps': round(len(samples) / wall, 1),
+        'mean_ms': round(statistics.fmean(samples), 2),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'queries': round(statistics.fmean(queries), 1) if queries else None,
+    }
+
+
+def run_benchmark(requests=100, concurrency=4, mode='client', warmup=2, prefix='bench', log=None):
+    """Benchmark every page of :func:`benchmark_urls`; return the results as a dict.
+
+    ``mode`` is ``'client'`` (Django's test client, in process) or
+    ``'wsgi'`` (HTTP requests to a threaded WSGI server started on a free
+    local port).
+    """
+    from blog_project.wsgi import application
+
+    log = log or (lambda message: None)
+    server = None
+    if mode == 'wsgi':
+        server = make_server('127.0.0.1', 0, application, _ThreadingWSGIServer, _QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    cookies = {}
+    results = {}
+    try:
+        for name, path, username in benchmark_urls(prefix):
+            if username and username not in cookies:
+                cookies[username] = _session_cookie(username)
+            cookie = cookies.get(username)
+            if server is not None:
+                make_fetcher = lambda: _http_fetcher(server.server_port, cookie)  # noqa: E731
+            else:
+                make_fetcher = lambda: _client_fetcher(cookie)  # noqa: E731
+            results[name] = _measure(make_fetcher, path, requests, concurrency, warmup)
+            log(f'{name:<32} p50 {results[name]["p50_ms"]:>8} ms  p95 {results[name]["p95_ms"]:>8} ms  '
+                f'{results[name]["rps"]:>8} req/s  {results[name]["queries"]} queries')
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests_per_url': requests,
+        'database': {
+            'vendor': connections['default'].vendor,
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'activities': UserActivity.objects.count(),
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, tolerance=0.2, min_delta_ms=2.0):
+    """Describe pages that got slower or run more queries than in ``baseline``.
+
+    A page regresses when its p95 latency grows by more than ``tolerance``
+    (a fraction) and at least ``min_delta_ms``, or when it runs more
+    queries per request.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        p95, old_p95 = result['p95_ms'], before['p95_ms']
+        if p95 > old_p95 * (1 + tolerance) and p95 - old_p95 >= min_delta_ms:
+            regressions.append(f'{name}: p95 {old_p95} ms -> {p95} ms')
+        if result['queries'] is not None and before['queries'] is not None and result['queries'] > before['queries']:
+            regressions.append(f'{name}: {before["queries"]} -> {result["queries"]} queries per request')
+    return regressions
+
+
+def load_results(path):
+    with open(path) as baseline:
+        return json.load(baseline)
+
+
+def save_results(results, path):
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2)
+        output.write('\n')
@@ -0,0 +1,307 @@
+"""Caching for the blog's public pages.
+
+Cached entries are grouped (``'home'``, ``'post:<slug>'``,
+``'category:<slug>'``, ``'tag:<slug>'``) and every group has a generation
+counter that is part of the cache key. Invalidating a group bumps its
+counter, so all pages of that group, whatever their page number, miss on
+the next request and the stale entries simply expire. Bumping ``'all'``
+invalidates every page.
+
+Search results are cached as ordered id lists under a single ``'search'``
+generation that any change to a public post bumps.
+
+``ConditionalGetMixin`` adds ``ETag``/``Last-Modified`` validators and
+answers matching conditional requests with 304 before the view runs. List
+pages take their validators from the generations of their groups and the
+time each was last bumped, so revalidating them costs one cache read.
+
+The home sidebar is cached separately as a snapshot that is dropped when
+posts, categories or tags change.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+
+GENERATION_PREFIX = 'blog:gen:'
+BUMPED_PREFIX = 'blog:bumped:'
+PAGE_PREFIX = 'blog:page:'
+SIDEBAR_KEY = 'blog:sidebar'
+SEARCH_PREFIX = 'blog:search:'
+# Headers a view may set that a page served from the cache must repeat;
+# validators are recomputed on every request instead
+CACHED_HEADERS = ('Cache-Control', 'Content-Language', 'Content-Disposition', 'Vary', 'X-Robots-Tag')
+
+
+def get_generations(groups):
+    keys = [f'{GENERATION_PREFIX}{group}' for group in groups]
+    found = cache.get_many(keys)
+    return [found.get(key, 0) for key in keys]
+
+
+def bump_generations(*groups):
+    for group in set(groups):
+        key = f'{GENERATION_PREFIX}{group}'
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+    now = time.time()
+    cache.set_many({f'{BUMPED_PREFIX}{group}': now for group in groups}, timeout=None)
+
+
+def get_group_validators(groups, period):
+    """``(last_modified, version)`` of pages depending on ``groups``.
+
+    ``last_modified`` is when one of the groups was last bumped, or first
+    asked about if the cache does not know (so a cleared cache never makes
+    a page look older than it is); ``version`` joins their generations.
+
+    The pages also show counters and a sidebar that change without bumping
+    a group, so both validators move on at least every ``period`` seconds,
+    like the cached copy of the page expires.
+    """
+    generation_keys = [f'{GENERATION_PREFIX}{group}' for group in groups]
+    bumped_keys = [f'{BUMPED_PREFIX}{group}' for group in groups]
+    found = cache.get_many([*generation_keys, *bumped_keys])
+    now = time.time()
+    for key in bumped_keys:
+        if key not in found:
+            cache.add(key, now, timeout=None)
+    bucket = int(now // period)
+    last_modified = max(bucket * period, *(found.get(key, now) for key in bumped_keys))
+    version = '.'.join(str(found.get(key, 0)) for key in generation_keys) + f'@{bucket}'
+    return datetime.fromtimestamp(last_modified, timezone.utc), version
+
+
+def page_cache_timeout():
+    return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 300)
+
+
+def page_cache_applies(request):
+    """Whether the response to ``request`` may be served from the page cache"""
+    if not page_cache_timeout() or request.method not in ('GET', 'HEAD'):
+        return False
+    if set(request.GET) - {'page', 'cursor'}:
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pages carrying flash messages must be rendered for this request only
+    return not len(get_messages(request))
+
+
+def page_cache_key(request, groups):
+    generations = get_generations(['all', *groups])
+    page = request.GET.get('cursor') or request.GET.get('page', '1')
+    version = '.'.join(str(generation) for generation in generations)
+    return f'{PAGE_PREFIX}{request.path}:{page}:{version}'
+
+
+class AnonymousPageCacheMixin:
+    """Serve rendered pages from the cache to anonymous GET requests.
+
+    Views list the invalidation groups their output depends on in
+    ``get_page_cache_groups()``. ``get_page_cache_extra()`` may store data
+    alongside the HTML that ``page_cache_hit()`` receives when the cached
+    copy is served, e.g. to keep counting views.
+    """
+
+    def get_page_cache_groups(self):
+        return []
+
+    def get_page_cache_extra(self):
+        return {}
+
+    def page_cache_hit(self, extra):
+        pass
+
+    def dispatch(self, request, *args, **kwargs):
+        if not page_cache_applies(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(request, self.get_page_cache_groups())
+        cached = cache.get(key)
+        if cached is not None:
+            self.page_cache_hit(cached['extra'])
+            response = HttpResponse(cached['content'], content_type=cached['content_type'])
+            for name, value in cached.get('headers', {}).items():
+                response[name] = value
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(
+                lambda rendered: self._store_page(key, rendered)
+            )
+        return response
+
+    def _store_page(self, key, response):
+        if response.cookies:
+            return
+        cache.set(key, {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'headers': {name: response[name] for name in CACHED_HEADERS if name in response},
+            'extra': self.get_page_cache_extra(),
+        }, page_cache_timeout())
+
+
+class ConditionalGetMixin:
+    """Answer ``If-None-Match``/``If-Modified-Since`` without rendering.
+
+    ``get_validators()`` returns ``(last_modified, version)`` or ``None`` to
+    serve the request normally. By default they come from the page cache
+    groups of the view (``get_validator_groups()``), which every edit shown
+    on the page bumps, so no query runs; a view can compute them instead.
+    Group validators also expire every ``BLOG_PAGE_CACHE_TIMEOUT`` seconds,
+    so view and comment counts are no staler than on a cached page. The
+    ETag also covers the URL, the visitor's session and CSRF cookie, since
+    pages embed per-visitor forms, and the page cache generations of the
+    view. List above ``AnonymousPageCacheMixin`` so a
+    304 skips the cache lookup.
+    """
+
+    def get_validator_groups(self):
+        get_groups = getattr(self, 'get_page_cache_groups', None)
+        return get_groups() if get_groups else None
+
+    def get_validators(self):
+        groups = self.get_validator_groups()
+        if groups is None or not page_cache_timeout():
+            return None
+        return get_group_validators(['all', *groups], page_cache_timeout())
+
+    def not_modified(self):
+        pass
+
+    def make_etag(self, request, last_modified, version):
+        get_groups = getattr(self, 'get_page_cache_groups', None)
+        generations = get_generations(['all', *(get_groups() if get_groups else [])])
+        raw = '|'.join(str(part) for part in (
+            request.get_full_path(),
+            request.user.pk or '',
+            request.session.session_key or '',
+            request.META.get('CSRF_COOKIE', ''),
+            last_modified.isoformat(),
+            version,
+            *generations,
+        ))
+        return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+        validators = self.get_validators()
+        if validators is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        last_modified, version = validators
+        etag = self.make_etag(request, last_modified, version)
+        timestamp = int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        elif response.status_code == 304:
+            self.not_modified()
+        if response.status_code in (200, 304):
+            response.setdefault('ETag', etag)
+            response.setdefault('Last-Modified', http_date(timestamp))
+            # The ETag depends on the visitor's cookies
+            patch_vary_headers(response, ['Cookie'])
+        return response
+
+
+def invalidate_post_pages(post, tag_slugs=()):
+    """Purge the detail page of ``post`` and every list it can appear on"""
+    from .models import Category
+
+    groups = ['home', f'post:{post.slug}', *(f'tag:{slug}' for slug in tag_slugs)]
+    old_slug = post.loaded_value('slug')
+    if old_slug and old_slug != post.slug:
+        groups.append(f'post:{old_slug}')
+    category_ids = {post.category_id, post.loaded_value('category_id')} - {None}
+    if category_ids:
+        groups.extend(
+            f'category:{slug}'
+            for slug in Category.objects.filter(pk__in=category_ids).values_list('slug', flat=True)
+        )
+    bump_generations(*groups)
+
+
+def invalidate_all_pages():
+    bump_generations('all')
+
+
+def build_sidebar():
+    """Compute the home page sidebar datasets from the database"""
+    from .models import Category, Post, Tag
+
+    return {
+        'categories': list(Category.objects.all()),
+        'popular_tags': list(
+            Tag.objects.filter(published_post_count__gt=0)
+            .order_by('-published_post_count', 'name')[:10]
+        ),
+        'popular_posts': list(
+            Post.objects.published().cards(tags=False)
+            .order_by('-views_count')[:5]
+        ),
+    }
+
+
+def get_sidebar():
+    """Return the cached sidebar snapshot, rebuilding it when missing.
+
+    The snapshot is dropped whenever posts, categories or tags change and
+    otherwise refreshed every ``BLOG_SIDEBAR_TIMEOUT`` seconds so popular
+    posts follow view counts.
+    """
+    sidebar = cache.get(SIDEBAR_KEY)
+    if sidebar is None:
+        sidebar = refresh_sidebar()
+    return sidebar
+
+
+def refresh_sidebar():
+    sidebar = build_sidebar()
+    cache.set(SIDEBAR_KEY, sidebar, getattr(settings, 'BLOG_SIDEBAR_TIMEOUT', 600))
+    return sidebar
+
+
+def invalidate_sidebar():
+    cache.delete(SIDEBAR_KEY)
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def search_cache_key(query, category_id, tag_id):
+    generation, = get_generations(['search'])
+    raw = f'{normalize_query(query)}|{category_id or ""}|{tag_id or ""}'
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f'{SEARCH_PREFIX}{generation}:{digest}'
+
+
+def get_search_results(query, category_id, tag_id, compute):
+    """Return the ordered post ids for a search, calling ``compute`` on a miss"""
+    timeout = getattr(settings, 'BLOG_SEARCH_CACHE_TIMEOUT', 600)
+    if not timeout:
+        return compute()
+    key = search_cache_key(query, category_id, tag_id)
+    post_ids = cache.get(key)
+    if post_ids is None:
+        post_ids = compute()
+        cache.set(key, post_ids, timeout)
+    return post_ids
+
+
+def invalidate_search_results():
+    bump_generations('search')
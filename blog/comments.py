@@ -0,0 +1,106 @@
+"""Paginated comment threads for the post page.
+
+A post page shows ``BLOG_COMMENTS_PER_PAGE`` top-level comments, newest
+first, each with its first ``BLOG_COMMENT_REPLIES_SHOWN`` replies, oldest
+first. Further pages of threads and of a thread's replies are fetched by
+"load more" links from the ``blog:comment_list`` endpoint, which returns
+the same HTML fragment.
+
+Both lists use keyset pagination on ``(created_at, id)`` with the cursor
+tokens of ``blog.pagination``, so loading the thousandth page of a busy
+post costs the same as the first. The replies of a page of threads are
+loaded with a single windowed query, and comment authors and their
+profiles are joined in, so a page runs a fixed number of queries however
+many comments the post has.
+"""
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404
+from django.urls import reverse
+
+from .models import Comment
+from .pagination import NEXT, decode_cursor, encode_cursor
+
+CURSOR_FIELDS = ('created_at', 'id')
+
+
+def comments_per_page():
+    return getattr(settings, 'BLOG_COMMENTS_PER_PAGE', 20)
+
+
+def replies_shown():
+    return getattr(settings, 'BLOG_COMMENT_REPLIES_SHOWN', 3)
+
+
+def approved_comments(post):
+    return Comment.objects.filter(post=post, status='approved').select_related('user__profile')
+
+
+def _cursor(comment):
+    return encode_cursor(NEXT, [comment.created_at, comment.id])
+
+
+def _after(queryset, token, newest_first):
+    """Rows of ``queryset`` past the comment encoded in ``token``"""
+    direction, (created_at, pk) = decode_cursor(token, Comment, CURSOR_FIELDS)
+    if direction != NEXT:
+        raise Http404('Invalid cursor.')
+    if newest_first:
+        return queryset.filter(Q(created_at__lte=created_at) & ~Q(created_at=created_at, id__gte=pk))
+    return queryset.filter(Q(created_at__gte=created_at) & ~Q(created_at=created_at, id__lte=pk))
+
+
+def more_url(post, cursor, parent=None):
+    url = f"{reverse('blog:comment_list', kwargs={'slug': post.slug})}?cursor={cursor}"
+    return f'{url}&parent={parent.pk}' if parent is not None else url
+
+
+def attach_replies(post, threads, limit=None):
+    """Set ``shown_replies`` and ``more_replies_url`` on each of ``threads``"""
+    limit = replies_shown() if limit is None else limit
+    by_id = {thread.pk: thread for thread in threads}
+    for thread in threads:
+        thread.shown_replies = []
+        thread.more_replies_url = None
+    if not by_id or not limit:
+        return threads
+
+    replies = approved_comments(post).filter(parent__in=list(by_id)).annotate(
+        position=Window(
+            RowNumber(), partition_by=F('parent_id'),
+            order_by=[F('created_at').asc(), F('id').asc()],
+        ),
+    ).filter(position__lte=limit + 1).order_by('parent_id', 'position')
+    for reply in replies:
+        thread = by_id[reply.parent_id]
+        if reply.position > limit:
+            thread.more_replies_url = more_url(post, _cursor(thread.shown_replies[-1]), thread)
+        else:
+            thread.shown_replies.append(reply)
+    return threads
+
+
+def comment_page(post, cursor=None, parent=None):
+    """One page of threads, or of the replies to ``parent``.
+
+    Returns ``(comments, more_url)``; ``more_url`` is ``None`` on the last
+    page. Raises Http404 for an invalid cursor.
+    """
+    size = comments_per_page()
+    newest_first = parent is None
+    if parent is None:
+        queryset = approved_comments(post).filter(parent__isnull=True).order_by('-created_at', '-id')
+    else:
+        queryset = approved_comments(post).filter(parent=parent).order_by('created_at', 'id')
+    if cursor:
+        queryset = _after(queryset, cursor, newest_first)
+
+    comments = list(queryset[:size + 1])
+    next_url = None
+    if len(comments) > size:
+        comments = comments[:size]
+        next_url = more_url(post, _cursor(comments[-1]), parent)
+    if parent is None:
+        attach_replies(post, comments)
+    return comments, next_url
@@ -0,0 +1,278 @@
+"""Buffered view counting for blog posts.
+
+Reading a post used to issue a read-modify-write ``save()`` on every hit,
+which serialised all readers behind SQLite's write lock. Views are now
+accumulated in a buffer and written back periodically as batched
+``F('views_count') + n`` updates.
+
+Two buffers are available, selected with ``BLOG_VIEW_COUNT_BACKEND``:
+
+* ``'local'`` keeps the counts in the worker's memory. Each worker flushes
+  its own buffer once ``BLOG_VIEW_COUNT_FLUSH_INTERVAL`` seconds have passed
+  and again when the process exits.
+* ``'cache'`` keeps the counts in the Django cache named by
+  ``BLOG_VIEW_COUNT_CACHE``, so they can be drained from any process with
+  the ``flush_view_counts`` management command, which only visits the
+  posts listed as having buffered views. Use a cache with atomic ``incr``
+  (Redis, Memcached) for this mode.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# Seconds a flush may hold a post's buffer before another process may take it
+LOCK_TIMEOUT = 60
+# Seconds take_dirty() waits for a numbered but unwritten dirty slot
+SLOT_GRACE = 60
+
+
+def write_view_counts(counts):
+    """Apply a ``{post_id: views}`` mapping as batched UPDATE statements."""
+    from .counts import refresh_post_author_stats
+    from .models import Post
+
+    by_increment = defaultdict(list)
+    for post_id, views in counts.items():
+        if views > 0:
+            by_increment[views].append(post_id)
+
+    with transaction.atomic():
+        for views, post_ids in by_increment.items():
+            Post.objects.filter(pk__in=post_ids).update(
+                views_count=F('views_count') + views
+            )
+        refresh_post_author_stats([post_id for post_ids in by_increment.values() for post_id in post_ids])
+    return sum(counts.values())
+
+
+def flush_quietly(counter):
+    """Flush from a request: a failed write keeps the views and never fails the page"""
+    try:
+        counter.flush()
+    except Exception:
+        logger.exception('Flushing buffered post views failed; retrying on the next flush')
+
+
+class LocalViewCounter:
+    """Per-worker in-memory view buffer"""
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, post_id, views=1):
+        with self._lock:
+            self._pending[post_id] += views
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            flush_quietly(self)
+
+    def pending(self, post_id):
+        return self._pending.get(post_id, 0)
+
+    def flush(self, post_ids=None):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            return write_view_counts(pending)
+        except Exception:
+            # e.g. "database is locked": keep the views for the next flush
+            with self._lock:
+                self._pending.update(pending)
+            raise
+
+
+class CacheViewCounter:
+    """View buffer stored in a shared Django cache"""
+    key_prefix = 'blog:views:'
+
+    def __init__(self, flush_interval, cache_alias):
+        self.flush_interval = flush_interval
+        self.cache_alias = cache_alias
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def make_key(self, post_id):
+        return f'{self.key_prefix}{post_id}'
+
+    def lock_key(self, post_id):
+        return f'{self.key_prefix}lock:{post_id}'
+
+    def record_buffered(self, post_id, views):
+        """Add ``views`` to the buffer of a post without flushing"""
+        key = self.make_key(post_id)
+        self.cache.add(key, 0, timeout=None)
+        try:
+            total = self.cache.incr(key, views)
+        except ValueError:
+            # The key was evicted between add() and incr()
+            self.cache.set(key, views, timeout=None)
+            total = views
+        if total == views:
+            # The post had nothing buffered: list it for flush_view_counts
+            self.mark_dirty(post_id)
+        with self._lock:
+            self._dirty.add(post_id)
+
+    def record(self, post_id, views=1):
+        self.record_buffered(post_id, views)
+        with self._lock:
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            flush_quietly(self)
+
+    def pending(self, post_id):
+        return self.cache.get(self.make_key(post_id)) or 0
+
+    # Posts with buffered views are listed in numbered slots: the cache API
+    # has no sets, but an incr() per new entry hands out unique slot numbers.
+    def mark_dirty(self, post_id):
+        counter_key = f'{self.key_prefix}dirty'
+        self.cache.add(counter_key, 0, timeout=None)
+        try:
+            slot = self.cache.incr(counter_key)
+        except ValueError:
+            return
+        self.cache.set(f'{counter_key}:{slot}', post_id, timeout=None)
+
+    def take_dirty(self):
+        """Ids of the posts listed since the last call, across all processes"""
+        counter_key = f'{self.key_prefix}dirty'
+        done_key = f'{counter_key}:done'
+        last = self.cache.get(counter_key) or 0
+        done = self.cache.get(done_key) or 0
+        if last <= done:
+            return set()
+        slot_keys = {slot: f'{counter_key}:{slot}' for slot in range(done + 1, last + 1)}
+        found = self.cache.get_many(slot_keys.values())
+        # A missing slot may belong to a mark_dirty() that has taken its
+        # number but not written it yet: stop there and read it next time,
+        # unless it has stayed empty for SLOT_GRACE seconds
+        for slot, key in slot_keys.items():
+            if key not in found and not self._slot_abandoned(slot):
+                break
+            done = slot
+        self.cache.set(done_key, done, timeout=None)
+        self.cache.delete_many([key for slot, key in slot_keys.items() if slot <= done])
+        return set(found.values())
+
+    def _slot_abandoned(self, slot):
+        waiting_key = f'{self.key_prefix}dirty:waiting'
+        waiting = self.cache.get(waiting_key)
+        if waiting and waiting[0] == slot:
+            return time.time() - waiting[1] >= SLOT_GRACE
+        self.cache.set(waiting_key, (slot, time.time()), timeout=None)
+        return False
+
+    def flush(self, post_ids=None):
+        """Write buffered views to the database.
+
+        Without ``post_ids`` only the posts this worker has seen are flushed.
+        """
+        with self._lock:
+            if post_ids is None:
+                post_ids, self._dirty = self._dirty, set()
+            self._last_flush = time.monotonic()
+        if not post_ids:
+            return 0
+
+        # Only one process at a time may flush a post; the others leave it to
+        # the next flush
+        locked = [
+            post_id for post_id in post_ids
+            if self.cache.add(self.lock_key(post_id), 1, timeout=LOCK_TIMEOUT)
+        ]
+        busy = set(post_ids) - set(locked)
+        if busy:
+            with self._lock:
+                self._dirty.update(busy)
+
+        keys = {self.make_key(post_id): post_id for post_id in locked}
+        counts = {
+            keys[key]: views
+            for key, views in self.cache.get_many(keys).items()
+            if views and views > 0
+        }
+        if not counts:
+            self.cache.delete_many([self.lock_key(post_id) for post_id in locked])
+            return 0
+        # Claim the counts before writing them, so a flush running elsewhere
+        # cannot write the same views. Decrement rather than delete so views
+        # recorded meanwhile survive.
+        for post_id, views in counts.items():
+            try:
+                if self.cache.decr(self.make_key(post_id), views) > 0:
+                    # Views arrived since the read; keep the post listed
+                    self.mark_dirty(post_id)
+            except ValueError:
+                pass
+        try:
+            return write_view_counts(counts)
+        except Exception:
+            # e.g. "database is locked": put the views back for the next flush
+            for post_id, views in counts.items():
+                self.record_buffered(post_id, views)
+            raise
+        finally:
+            self.cache.delete_many([self.lock_key(post_id) for post_id in locked])
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_view_counter():
+    """Return the process-wide view counter configured in settings"""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                backend = getattr(settings, 'BLOG_VIEW_COUNT_BACKEND', 'local')
+                interval = getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', 30)
+                if backend == 'cache':
+                    _counter = CacheViewCounter(
+                        interval,
+                        getattr(settings, 'BLOG_VIEW_COUNT_CACHE', 'default'),
+                    )
+                else:
+                    _counter = LocalViewCounter(interval)
+    return _counter
+
+
+def record_view(post_id):
+    get_view_counter().record(post_id)
+
+
+def flush_views(post_ids=None):
+    """Flush buffered views; safe to call when nothing was recorded"""
+    if _counter is None:
+        return 0
+    return _counter.flush(post_ids)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush_views()
+    except Exception:
+        # The database may already be unavailable during interpreter shutdown
+        pass
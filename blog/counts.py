@@ -0,0 +1,130 @@
+"""Denormalized counters.
+
+``Category.published_post_count``, ``Tag.published_post_count`` and
+``Post.approved_comment_count`` are kept in sync by the signals in
+``blog.signals``. Each refresh is a single ``UPDATE ... SET count = (SELECT
+COUNT(*) ...)`` for the affected rows, so concurrent changes cannot leave a
+counter off by one the way read-modify-write increments can, and a refresh
+is idempotent. ``manage.py recount`` runs the same updates over every row to
+repair drift, e.g. after raw SQL or ``QuerySet.update()`` calls that bypass
+signals.
+
+Author dashboard totals live in ``AuthorStats`` rows, recomputed for the
+affected authors by one conditional aggregate whenever their posts,
+comments or flushed view counts change.
+"""
+from django.conf import settings
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AuthorStats, Category, Comment, Post, Tag
+
+AUTHOR_STAT_FIELDS = ('total_posts', 'published_posts', 'draft_posts', 'total_views', 'total_comments')
+
+
+def _count_of(queryset, group_by):
+    subquery = queryset.order_by().values(group_by).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def _restrict(queryset, pks):
+    if pks is None:
+        return queryset
+    pks = {pk for pk in pks if pk is not None}
+    return queryset.filter(pk__in=pks) if pks else queryset.none()
+
+
+def refresh_category_counts(category_ids=None):
+    """Recount published posts of the given categories (all when ``None``)"""
+    published = Post.objects.filter(category=OuterRef('pk'), status='published')
+    return _restrict(Category.objects.all(), category_ids).update(
+        published_post_count=_count_of(published, 'category')
+    )
+
+
+def refresh_tag_counts(tag_ids=None):
+    """Recount published posts of the given tags (all when ``None``)"""
+    published = Post.tags.through.objects.filter(tag=OuterRef('pk'), post__status='published')
+    return _restrict(Tag.objects.all(), tag_ids).update(
+        published_post_count=_count_of(published, 'tag')
+    )
+
+
+def refresh_comment_counts(post_ids=None):
+    """Recount approved comments of the given posts (all when ``None``)"""
+    approved = Comment.objects.filter(post=OuterRef('pk'), status='approved')
+    return _restrict(Post.objects.all(), post_ids).update(
+        approved_comment_count=_count_of(approved, 'post')
+    )
+
+
+def author_stats_enabled():
+    return getattr(settings, 'BLOG_AUTHOR_STATS', True)
+
+
+def _author_totals():
+    return {
+        'total_posts': Count('pk'),
+        'published_posts': Count('pk', filter=Q(status='published')),
+        'draft_posts': Count('pk', filter=Q(status='draft')),
+        'total_views': Coalesce(Sum('views_count'), 0),
+        'total_comments': Coalesce(Sum('approved_comment_count'), 0),
+    }
+
+
+def aggregate_author_stats(posts):
+    """Dashboard totals over ``posts`` in a single query"""
+    return posts.aggregate(**_author_totals())
+
+
+def refresh_author_stats(author_ids=None):
+    """Recompute ``AuthorStats`` of the given authors (all authors when ``None``)"""
+    if not author_ids and author_ids is not None:
+        return 0
+    posts = Post.objects.order_by()
+    if author_ids is not None:
+        posts = posts.filter(author_id__in={pk for pk in author_ids if pk is not None})
+    rows = posts.values('author_id').annotate(**_author_totals())
+    now = timezone.now()
+    stats = [AuthorStats(updated_at=now, **row) for row in rows]
+    AuthorStats.objects.bulk_create(
+        stats,
+        update_conflicts=True,
+        unique_fields=['author'],
+        update_fields=[*AUTHOR_STAT_FIELDS, 'updated_at'],
+    )
+    # Authors whose last post was deleted
+    emptied = AuthorStats.objects.exclude(author_id__in=[row.author_id for row in stats])
+    if author_ids is not None:
+        emptied = emptied.filter(author_id__in=author_ids)
+    emptied.update(**{field: 0 for field in AUTHOR_STAT_FIELDS}, updated_at=now)
+    return len(stats)
+
+
+def refresh_post_author_stats(post_ids):
+    """Recompute ``AuthorStats`` of the authors of the given posts"""
+    if author_stats_enabled() and post_ids:
+        refresh_author_stats(set(
+            Post.objects.filter(pk__in=post_ids).values_list('author_id', flat=True)
+        ))
+
+
+def get_author_stats(author):
+    """Dashboard totals of ``author`` as a dict"""
+    if not author_stats_enabled():
+        return aggregate_author_stats(Post.objects.filter(author=author))
+    stats = AuthorStats.objects.filter(author=author).values(*AUTHOR_STAT_FIELDS).first()
+    if stats is None:
+        refresh_author_stats([author.pk])
+        stats = AuthorStats.objects.filter(author=author).values(*AUTHOR_STAT_FIELDS).first()
+    return stats or dict.fromkeys(AUTHOR_STAT_FIELDS, 0)
+
+
+def recount_all():
+    return {
+        'categories': refresh_category_counts(),
+        'tags': refresh_tag_counts(),
+        'posts': refresh_comment_counts(),
+        'authors': refresh_author_stats(),
+    }
@@ -15,7 +15,7 @@ class PostForm(forms.ModelForm):
 
     class Meta:
         model = Post
-        fields = ('title', 'slug', 'excerpt', 'content', 'category', 'tags', 
+        fields = ('title', 'slug', 'excerpt', 'content', 'content_format', 'category', 'tags', 
                   'featured_image', 'status')
         widgets = {
             'title': forms.TextInput(attrs={
@@ -36,6 +36,7 @@ class PostForm(forms.ModelForm):
                 'rows': 8,
                 'placeholder': 'Write your post content here'
             }),
+            'content_format': forms.Select(attrs={'class': 'form-select'}),
             'category': forms.Select(attrs={'class': 'form-select'}),
             'featured_image': forms.FileInput(attrs={'class': 'form-control'}),
             'status': forms.Select(attrs={'class': 'form-select'}),
@@ -53,6 +54,7 @@ class PostForm(forms.ModelForm):
                 'slug',
                 'excerpt',
                 'content',
+                'content_format',
                 Row(
                     Column('category', css_class='form-group col-md-6 mb-0'),
                     Column('status', css_class='form-group col-md-6 mb-0'),
@@ -82,8 +84,9 @@ class CommentForm(forms.ModelForm):
     """Form for posting comments on blog posts"""
     class Meta:
         model = Comment
-        fields = ('content',)
+        fields = ('content', 'parent')
         widgets = {
+            'parent': forms.HiddenInput(),
             'content': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 3,
@@ -92,18 +95,29 @@ class CommentForm(forms.ModelForm):
             })
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, post=None, **kwargs):
         super().__init__(*args, **kwargs)
+        # Replies may only answer approved comments on the same post
+        parents = Comment.objects.filter(status='approved')
+        self.fields['parent'].queryset = parents.filter(post=post) if post else parents.none()
         self.helper = FormHelper()
         self.helper.form_method = 'post'
         self.helper.layout = Layout(
             Fieldset(
                 'Add a Comment',
                 'content',
+                'parent',
             ),
             Submit('submit', 'Post Comment', css_class='btn btn-primary mt-2')
         )
 
+    def clean_parent(self):
+        parent = self.cleaned_data.get('parent')
+        # Threads are one level deep
+        if parent is not None and parent.parent_id is not None:
+            return parent.parent
+        return parent
+
 
 class SearchForm(forms.Form):
     """Form for searching blog posts"""
@@ -0,0 +1,80 @@
+"""Fragment cache for post cards.
+
+List pages render the same post cards over and over, and logged-in
+visitors never get a cached page. Each card is cached on its own, keyed by
+the card template, its options, the post id and ``updated_at``, and a
+version made of ``BLOG_CARD_TEMPLATE_VERSION`` and the ``'all'`` page cache
+generation. Editing a post or changing its tags moves ``updated_at``;
+renaming a category, a tag or an author bumps the generation. Either way
+the old key simply misses, so cards never need invalidating; bump the
+template version when card markup changes.
+
+Counters that change on every view are not part of the cached HTML: card
+templates print ``live.views_count`` and ``live.approved_comment_count``,
+which are placeholders in the cached fragment that are filled in from the
+post each time it is served.
+
+A page of cards costs one ``cache.get_many`` and, for the misses, one
+``cache.set_many``. Cards carrying a search snippet depend on the query
+and are always rendered.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .caching import get_generations
+
+CARD_PREFIX = 'blog:card:'
+
+
+def card_cache_timeout():
+    return getattr(settings, 'BLOG_CARD_CACHE_TIMEOUT', 3600)
+
+
+# Filled in from the post whenever a card is served
+LIVE_FIELDS = ('views_count', 'approved_comment_count')
+LIVE_SLOTS = {field: mark_safe(f'<!--card:{field}-->') for field in LIVE_FIELDS}
+
+
+def card_version():
+    generation, = get_generations(['all'])
+    return f"{getattr(settings, 'BLOG_CARD_TEMPLATE_VERSION', 1)}.{generation}"
+
+
+def card_key(template_name, post, options, version):
+    variant = ','.join(f'{name}={value}' for name, value in sorted(options.items()))
+    return f'{CARD_PREFIX}{template_name}:{variant}:v{version}:{post.pk}:{post.updated_at.timestamp()}'
+
+
+def fill_live_fields(fragment, post):
+    for field, slot in LIVE_SLOTS.items():
+        fragment = fragment.replace(slot, str(getattr(post, field)))
+    return fragment
+
+
+def render_cards(template_name, posts, **options):
+    """Render ``template_name`` once per post, reusing cached cards"""
+    timeout = card_cache_timeout()
+    keys = {}
+    if timeout:
+        version = card_version()
+        keys = {
+            post.pk: card_key(template_name, post, options, version)
+            for post in posts if not getattr(post, 'search_snippet', None)
+        }
+    cached = cache.get_many(keys.values()) if keys else {}
+
+    html = []
+    rendered = {}
+    for post in posts:
+        key = keys.get(post.pk)
+        fragment = cached.get(key)
+        if fragment is None:
+            fragment = render_to_string(template_name, {'post': post, 'live': LIVE_SLOTS, **options})
+            if key:
+                rendered[key] = fragment
+        html.append(fill_live_fields(fragment, post))
+    if rendered:
+        cache.set_many(rendered, timeout)
+    return ''.join(html)
@@ -0,0 +1,144 @@
+"""Resized derivatives of uploaded images.
+
+Featured images and avatars are uploaded at whatever size the author had,
+but pages show them a few hundred pixels wide. For every uploaded image a
+set of derivatives is written next to the media files, at each width in
+``BLOG_IMAGE_WIDTHS`` that is not larger than the original, as WebP and
+JPEG. Derivatives are re-encoded from the decoded pixels, so EXIF and other
+metadata (camera, GPS position) are not carried over; the orientation tag
+is applied to the pixels first.
+
+Generation runs in the background after the upload is committed
+(:func:`ensure_derivatives`). Which widths exist for an image is cached;
+when the cache knows nothing about an image the storage is checked, and
+legacy images without derivatives are queued for generation the first time
+a page shows them. ``manage.py generate_image_derivatives`` does all of
+them up front.
+"""
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .tasks import run_once_after_commit, run_once_in_background
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'derivatives'
+CACHE_PREFIX = 'blog:img:'
+MANIFEST_TIMEOUT = 60 * 60 * 24
+# How long pages serve the original while derivatives are being generated
+# before storage is checked again
+PENDING_TIMEOUT = 60 * 5
+
+
+def image_widths():
+    return tuple(sorted(getattr(settings, 'BLOG_IMAGE_WIDTHS', (160, 320, 640, 1280))))
+
+
+def image_formats():
+    # Pillow may be built without WebP; JPEG is always there
+    return ('webp', 'jpeg') if features.check('webp') else ('jpeg',)
+
+
+def derivative_name(name, width, image_format):
+    stem, _ = os.path.splitext(name)
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    return f'{DERIVATIVE_DIR}/{stem}-{width}w.{extension}'
+
+
+def _manifest_key(name):
+    return f'{CACHE_PREFIX}{name}'
+
+
+def _encode(image, width, image_format):
+    resized = image.copy()
+    resized.thumbnail((width, width * 10), Image.LANCZOS)
+    if image_format == 'jpeg' and resized.mode != 'RGB':
+        background = Image.new('RGB', resized.size, 'white')
+        rgba = resized.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        resized = background
+    elif image_format == 'webp' and resized.mode not in ('RGB', 'RGBA'):
+        resized = resized.convert('RGBA')
+    buffer = io.BytesIO()
+    quality = getattr(settings, 'BLOG_IMAGE_QUALITY', 80)
+    options = {'optimize': True, 'progressive': True} if image_format == 'jpeg' else {'method': 4}
+    resized.save(buffer, image_format.upper(), quality=quality, **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, force=False):
+    """Write the derivatives of the image stored as ``name``; return their widths"""
+    if not name or not default_storage.exists(name):
+        # Remember missing originals so pages stop queueing them
+        cache.set(_manifest_key(name), [], MANIFEST_TIMEOUT)
+        return []
+    try:
+        with default_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, Image.DecompressionBombError):
+        logger.warning('Cannot create derivatives of unreadable image %s', name)
+        cache.set(_manifest_key(name), [], MANIFEST_TIMEOUT)
+        return []
+
+    # Never upscale; an image narrower than every width gets one derivative
+    # at its own width
+    widths = [width for width in image_widths() if width <= image.width] or [image.width]
+
+    for width in widths:
+        for image_format in image_formats():
+            target = derivative_name(name, width, image_format)
+            if default_storage.exists(target):
+                if not force:
+                    continue
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(_encode(image, width, image_format)))
+
+    cache.set(_manifest_key(name), widths, MANIFEST_TIMEOUT)
+    return widths
+
+
+def find_derivatives(name):
+    """Look up the derivative widths of ``name`` in storage and cache them if any exist.
+
+    Only the configured widths are probed; the single derivative of an
+    image narrower than all of them is found by generating again, which
+    keeps the existing file.
+    """
+    image_format = image_formats()[-1]
+    widths = [
+        width for width in image_widths()
+        if default_storage.exists(derivative_name(name, width, image_format))
+    ]
+    if widths:
+        cache.set(_manifest_key(name), widths, MANIFEST_TIMEOUT)
+    return widths
+
+
+def ensure_derivatives(field_file):
+    """Queue derivative generation for a just-saved image unless it already has them"""
+    if field_file and cache.get(_manifest_key(field_file.name)) is None:
+        run_once_after_commit(generate_derivatives, field_file.name)
+
+
+def get_derivatives(field_file):
+    """Return the derivative widths of an image, queueing generation if there are none"""
+    if not field_file:
+        return []
+    widths = cache.get(_manifest_key(field_file.name))
+    if widths is None:
+        widths = find_derivatives(field_file.name)
+        if not widths:
+            # Remember the miss so pages don't probe storage on every render
+            # while the derivatives are generated
+            cache.set(_manifest_key(field_file.name), [], PENDING_TIMEOUT)
+            run_once_in_background(generate_derivatives, field_file.name)
+    return widths
@@ -0,0 +1,130 @@
+"""Per-request performance instrumentation.
+
+``UserActivityMiddleware`` measures every request with a
+:class:`RequestMetrics`: wall time, the number and total duration of
+database queries (through ``connection.execute_wrapper`` on every
+configured database), template render time and response size. The
+figures are
+
+* sent back in a ``Server-Timing`` header (``BLOG_SERVER_TIMING``), which
+  browser developer tools display next to the request,
+* added to in-process totals per resolved view name
+  (:func:`get_view_stats`), and
+* logged as a warning on the ``blog.performance`` logger when the request
+  exceeds its time or query budget. ``BLOG_REQUEST_TIME_BUDGET`` (ms) and
+  ``BLOG_REQUEST_QUERY_BUDGET`` apply to every view; ``BLOG_REQUEST_BUDGETS``
+  overrides them per view name, e.g. ``{'blog:search': {'time': 800}}``.
+
+Render time is only known for ``TemplateResponse`` views (all class-based
+views), which are rendered after the view returns.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('blog.performance')
+
+_view_stats = {}
+_view_stats_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """Timings collected while one request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_started = None
+        self.render_time = None
+        self.size = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def capture_queries(self):
+        """Context manager counting queries on every database while active"""
+        stack = ExitStack()
+        for alias in settings.DATABASES:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+    def finish(self, response):
+        now = time.perf_counter()
+        self.duration = now - self.started
+        if self.render_started is not None:
+            self.render_time = now - self.render_started
+        if not response.streaming:
+            self.size = len(response.content)
+
+    def server_timing(self):
+        entries = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'total;dur={self.duration * 1000:.1f}',
+        ]
+        if self.render_time is not None:
+            entries.insert(1, f'tpl;dur={self.render_time * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def get_budget(view_name):
+    budget = {
+        'time': getattr(settings, 'BLOG_REQUEST_TIME_BUDGET', 500),
+        'queries': getattr(settings, 'BLOG_REQUEST_QUERY_BUDGET', 30),
+    }
+    budget.update(getattr(settings, 'BLOG_REQUEST_BUDGETS', {}).get(view_name, {}))
+    return budget
+
+
+def check_budget(request, view_name, metrics):
+    budget = get_budget(view_name)
+    duration_ms = metrics.duration * 1000
+    if duration_ms > budget['time'] or metrics.queries > budget['queries']:
+        logger.warning(
+            'Over budget: %s %s (%s) took %.0f ms (budget %s ms) with %d queries '
+            '(budget %s), %.0f ms in the database',
+            request.method, request.path, view_name, duration_ms, budget['time'],
+            metrics.queries, budget['queries'], metrics.db_time * 1000,
+        )
+
+
+def record_view_stats(view_name, metrics):
+    with _view_stats_lock:
+        stats = _view_stats.setdefault(view_name, {
+            'requests': 0, 'time': 0.0, 'max_time': 0.0,
+            'queries': 0, 'db_time': 0.0, 'render_time': 0.0, 'bytes': 0,
+        })
+        stats['requests'] += 1
+        stats['time'] += metrics.duration
+        stats['max_time'] = max(stats['max_time'], metrics.duration)
+        stats['queries'] += metrics.queries
+        stats['db_time'] += metrics.db_time
+        stats['render_time'] += metrics.render_time or 0.0
+        stats['bytes'] += metrics.size or 0
+
+
+def get_view_stats():
+    """Per-view totals since start-up (or the last reset), with averages"""
+    with _view_stats_lock:
+        snapshot = {name: dict(stats) for name, stats in _view_stats.items()}
+    for stats in snapshot.values():
+        requests = stats['requests']
+        stats['avg_time_ms'] = round(stats['time'] * 1000 / requests, 2)
+        stats['avg_queries'] = round(stats['queries'] / requests, 2)
+        stats['avg_bytes'] = round(stats['bytes'] / requests)
+    return snapshot
+
+
+def reset_view_stats():
+    with _view_stats_lock:
+        _view_stats.clear()
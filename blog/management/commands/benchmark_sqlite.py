@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from blog.sqlite import benchmark_profile
+
+
+class Command(BaseCommand):
+    help = 'Compare SQLite tuning profiles under concurrent readers and writers on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=4,
+            help='Number of reader threads',
+        )
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=2,
+            help='Number of writer threads',
+        )
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=5.0,
+            help='Duration of each run',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=5000,
+            help='Number of rows in the scratch table',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON',
+        )
+
+    def handle(self, *args, **options):
+        runs = [
+            # Stock SQLite, one connection per request (no CONN_MAX_AGE)
+            ('default', False),
+            ('default', True),
+            ('production', False),
+            # WAL profile with persistent connections
+            ('production', True),
+        ]
+        reports = []
+        for profile, persistent in runs:
+            reports.append(benchmark_profile(
+                profile,
+                readers=options['readers'],
+                writers=options['writers'],
+                seconds=options['seconds'],
+                rows=options['rows'],
+                persistent=persistent,
+            ))
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+        self.stdout.write(
+            f'{"profile":<12}{"connections":<13}{"reads/s":>10}{"read p95":>10}'
+            f'{"writes/s":>10}{"write p95":>11}{"errors":>8}'
+        )
+        for report in reports:
+            self.stdout.write(
+                f'{report["profile"]:<12}{"persistent" if report["persistent"] else "per request":<13}'
+                f'{report["read"]["ops_per_second"]:>10}{report["read"]["p95_ms"]:>9}ms'
+                f'{report["write"]["ops_per_second"]:>10}{report["write"]["p95_ms"]:>9}ms'
+                f'{report["errors"]:>8}'
+            )
+        self.stdout.write(self.style.SUCCESS('Benchmark complete.'))
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.counters import get_view_counter
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Write buffered post view counts to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of posts to drain from the cache per round trip',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Check every post instead of only those listed as having buffered views',
+        )
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'BLOG_VIEW_COUNT_BACKEND', 'local') != 'cache':
+            self.stdout.write(
+                'BLOG_VIEW_COUNT_BACKEND is "local": each worker flushes its own '
+                'buffer on its interval and at exit, so there is nothing to drain here.'
+            )
+            return
+
+        counter = get_view_counter()
+        batch_size = options['batch_size']
+        if options['all']:
+            post_ids = list(Post.objects.values_list('pk', flat=True))
+        else:
+            post_ids = sorted(counter.take_dirty())
+        written = 0
+        for start in range(0, len(post_ids), batch_size):
+            written += counter.flush(post_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Flushed {written} view(s).'))
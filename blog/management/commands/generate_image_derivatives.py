@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserProfile
+from blog.images import generate_derivatives
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Create resized derivatives of all featured images and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-encode derivatives that already exist')
+
+    def handle(self, *args, **options):
+        names = set(
+            Post.objects.exclude(featured_image='').exclude(featured_image__isnull=True)
+            .values_list('featured_image', flat=True)
+        )
+        names.update(
+            UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True)
+            .values_list('avatar', flat=True)
+        )
+        for name in sorted(names):
+            widths = generate_derivatives(name, force=options['force'])
+            if not widths:
+                self.stderr.write(f'Skipped {name}: missing or unreadable')
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(names)} image(s).'))
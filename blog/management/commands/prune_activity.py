@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from blog.retention import archive_dir, prune_activity, retention_days
+
+
+class Command(BaseCommand):
+    help = 'Archive user activity older than the retention window to compressed files and delete it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Keep this many days of activity (default: BLOG_ACTIVITY_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of activity rows per archive file and delete',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=None,
+            help='Directory for the archive files (default: BLOG_ACTIVITY_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be pruned',
+        )
+
+    def handle(self, *args, **options):
+        days = retention_days() if options['days'] is None else options['days']
+        directory = options['archive_dir'] or archive_dir()
+        count = prune_activity(days, options['batch_size'], directory, options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{count} activity row(s) older than {days} day(s) can be pruned.')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived and deleted {count} activity row(s) older than {days} day(s) to {directory}.'
+        ))
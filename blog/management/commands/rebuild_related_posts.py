@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related-posts neighbour lists for all published posts'
+
+    def handle(self, *args, **options):
+        count = rebuild_related_posts()
+        self.stdout.write(self.style.SUCCESS(f'Computed related posts for {count} post(s).'))
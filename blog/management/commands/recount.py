@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.counts import recount_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized post, comment and author counters from scratch'
+
+    def handle(self, *args, **options):
+        updated = recount_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Recounted {updated['categories']} categor(ies), {updated['tags']} tag(s), "
+            f"{updated['posts']} post(s) and {updated['authors']} author(s)."
+        ))
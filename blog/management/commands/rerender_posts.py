@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog.rendering import rerender_posts
+
+
+class Command(BaseCommand):
+    help = 'Re-render stored post HTML whose source or renderer version changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-render every post')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rerender_posts(force=options['force'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Re-rendered {count} post(s).'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.rollups import rollup_activity
+
+
+class Command(BaseCommand):
+    help = 'Aggregate new user activity into the daily post and author stats tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of activity rows read per transaction',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep rolling up new activity instead of exiting',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=300.0,
+            help='Seconds to wait between runs when --loop is given',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = rollup_activity(options['batch_size'])
+            self.stdout.write(f'Rolled up {processed} activity row(s).')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Rollup complete.'))
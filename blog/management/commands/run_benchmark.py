@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.benchmark import compare_results, load_results, run_benchmark, save_results
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, throughput and queries per request of the main pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Measured requests per page')
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of concurrent clients')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per client and page')
+        parser.add_argument(
+            '--mode',
+            choices=['client', 'wsgi'],
+            default='client',
+            help="'client' uses Django's test client; 'wsgi' sends HTTP requests to a local WSGI server",
+        )
+        parser.add_argument('--prefix', default='bench', help='Prefix used by seed_benchmark_data')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON file to check the results against')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed p95 latency growth over the baseline, as a fraction',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = run_benchmark(
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                mode=options['mode'],
+                warmup=options['warmup'],
+                prefix=options['prefix'],
+                log=self.stdout.write,
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options['output']:
+            save_results(results, options['output'])
+            self.stdout.write(f'Results written to {options["output"]}.')
+        if options['compare']:
+            baseline = load_results(options['compare'])
+            if baseline.get('mode') != results['mode']:
+                self.stderr.write(self.style.WARNING(
+                    f'The baseline was measured in {baseline.get("mode")} mode, not {results["mode"]}.'
+                ))
+            regressions = compare_results(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write('No regressions against the baseline.')
+        self.stdout.write(self.style.SUCCESS('Benchmark complete.'))
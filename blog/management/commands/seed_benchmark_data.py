@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from blog.benchmark import clear_benchmark_data, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, posts, comments and activity for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000, help='Number of posts')
+        parser.add_argument('--comments', type=int, default=10000, help='Number of comments')
+        parser.add_argument('--activities', type=int, default=100000, help='Number of user activity rows')
+        parser.add_argument('--users', type=int, default=200, help='Number of users (one in ten is an author)')
+        parser.add_argument('--categories', type=int, default=20, help='Number of categories')
+        parser.add_argument('--tags', type=int, default=200, help='Number of tags')
+        parser.add_argument('--days', type=int, default=90, help='Spread dates over this many past days')
+        parser.add_argument('--prefix', default='bench', help='Prefix of generated names and slugs')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data')
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete data previously generated with the same prefix first',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted = clear_benchmark_data(options['prefix'])
+            self.stdout.write(f'Deleted {deleted["users"]} user(s) and their data.')
+        counts = seed_benchmark_data(
+            posts=options['posts'],
+            comments=options['comments'],
+            activities=options['activities'],
+            users=options['users'],
+            categories=options['categories'],
+            tags=options['tags'],
+            days=options['days'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}.'))
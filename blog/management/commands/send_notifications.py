@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.notifications import deliver_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued email notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Maximum number of notifications sent per SMTP connection',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox instead of exiting when it is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10.0,
+            help='Seconds to wait between polls when --loop is given',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            try:
+                sent, failed = deliver_pending(batch_size)
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                # e.g. the database is locked; try again on the next poll
+                self.stderr.write(f'Delivery failed: {e}')
+                sent, failed = 0, batch_size
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} notification(s), {failed} failed.')
+            # Failed rows wait for their backoff, so only a fully sent batch
+            # means more may be due right away
+            if sent < batch_size:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Outbox drained.'))
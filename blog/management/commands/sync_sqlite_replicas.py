@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from blog.routers import replica_aliases
+
+
+def copy_database(source, target):
+    """Copy the SQLite database ``source`` to ``target`` with the online backup API"""
+    partial = f'{target}.part'
+    if os.path.exists(partial):
+        os.remove(partial)
+    src, dst = sqlite3.connect(source), sqlite3.connect(partial)
+    try:
+        src.backup(dst)
+        # A WAL-mode copy would pick up the -wal file left by the old replica
+        dst.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        dst.close()
+        src.close()
+    # Connections opened after the rename see the new copy
+    os.replace(partial, target)
+
+
+class Command(BaseCommand):
+    help = 'Refresh SQLite read replicas (BLOG_DATABASE_REPLICAS) with a copy of the primary database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep refreshing the replicas instead of exiting',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between copies when --loop is given',
+        )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = [
+            alias for alias in replica_aliases()
+            if settings.DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3'
+        ]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or not replicas:
+            raise CommandError('Needs a SQLite primary and at least one SQLite alias in BLOG_DATABASE_REPLICAS.')
+        while True:
+            for alias in replicas:
+                copy_database(str(primary['NAME']), str(settings.DATABASES[alias]['NAME']))
+            self.stdout.write(f'Copied the primary database to {", ".join(replicas)}.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Replicas refreshed.'))
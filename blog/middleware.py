@@ -1,20 +1,56 @@
-from django.utils.deprecation import MiddlewareMixin
-from .models import UserActivity
-
-
-class UserActivityMiddleware(MiddlewareMixin):
-    """Middleware to track user activity"""
-    
-    def process_request(self, request):
-        # Track login/logout events are handled in views
-        # This middleware can be extended for additional tracking
-        return None
-
-    @staticmethod
-    def get_client_ip(request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+import time
+
+from django.conf import settings
+from .instrumentation import RequestMetrics, check_budget, record_view_stats
+from .routers import end_request, replica_aliases, start_request
+
+
+class UserActivityMiddleware:
+    """Measure each request (see blog.instrumentation)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = request.metrics = RequestMetrics()
+        with metrics.capture_queries():
+            response = self.get_response(request)
+        metrics.finish(response)
+
+        match = request.resolver_match
+        view_name = (match.view_name if match else None) or 'unresolved'
+        record_view_stats(view_name, metrics)
+        check_budget(request, view_name, metrics)
+        if getattr(settings, 'BLOG_SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        # TemplateResponse objects are rendered right after this hook
+        request.metrics.render_started = time.perf_counter()
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """Let blog.routers send this request's reads to replicas unless it is pinned to the primary"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_aliases():
+            return self.get_response(request)
+        cookie = getattr(settings, 'BLOG_REPLICA_PIN_COOKIE', 'pin_primary')
+        tokens = start_request(pinned=cookie in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = end_request(tokens)
+        if wrote:
+            response.set_cookie(
+                cookie, '1',
+                max_age=getattr(settings, 'BLOG_REPLICA_PIN_SECONDS', 15),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts "
+    "USING fts5(title, excerpt, content, tokenize = 'porter unicode61')"
+)
+SQLITE_POPULATE = (
+    "INSERT INTO blog_post_fts (rowid, title, excerpt, content) "
+    "SELECT id, title, excerpt, content FROM blog_post WHERE status = 'published'"
+)
+POSTGRES_CREATE = [
+    "ALTER TABLE blog_post ADD COLUMN IF NOT EXISTS search_document tsvector",
+    "CREATE INDEX IF NOT EXISTS blog_post_search_document_idx ON blog_post USING GIN (search_document)",
+    "UPDATE blog_post SET search_document = "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(excerpt, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'C')",
+]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(SQLITE_CREATE)
+            except Exception:
+                # SQLite built without FTS5: search falls back to icontains
+                return
+            cursor.execute(SQLITE_POPULATE)
+        elif connection.vendor == 'postgresql':
+            for statement in POSTGRES_CREATE:
+                cursor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("DROP TABLE IF EXISTS blog_post_fts")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS blog_post_search_document_idx")
+            cursor.execute("ALTER TABLE blog_post DROP COLUMN IF EXISTS search_document")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_outboxnotification'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
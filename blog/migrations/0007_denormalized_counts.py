@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:13
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, group_by):
+    subquery = queryset.order_by().values(group_by).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def populate_counts(apps, schema_editor):
+    Category = apps.get_model('blog', 'Category')
+    Tag = apps.get_model('blog', 'Tag')
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    Category.objects.update(published_post_count=count_of(
+        Post.objects.filter(category=OuterRef('pk'), status='published'), 'category'
+    ))
+    Tag.objects.update(published_post_count=count_of(
+        Post.tags.through.objects.filter(tag=OuterRef('pk'), post__status='published'), 'tag'
+    ))
+    Post.objects.update(approved_comment_count=count_of(
+        Comment.objects.filter(post=OuterRef('pk'), status='approved'), 'post'
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='approved_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
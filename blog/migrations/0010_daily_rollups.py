@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_authorstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAuthorStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('edits', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily author stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPostStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('edits', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily post stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['created_at'], name='blog_userac_created_f5e397_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyauthorstats',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailypoststats',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='blog.post'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyauthorstats',
+            index=models.Index(fields=['date'], name='blog_dailya_date_c9f54c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyauthorstats',
+            constraint=models.UniqueConstraint(fields=('author', 'date'), name='unique_daily_author_stats'),
+        ),
+        migrations.AddIndex(
+            model_name='dailypoststats',
+            index=models.Index(fields=['date'], name='blog_dailyp_date_91ad65_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypoststats',
+            constraint=models.UniqueConstraint(fields=('post', 'date'), name='unique_daily_post_stats'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:41
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def move_user_agents(apps, schema_editor):
+    UserActivity = apps.get_model('blog', 'UserActivity')
+    UserAgent = apps.get_model('blog', 'UserAgent')
+    values = (
+        UserActivity.objects.exclude(user_agent='')
+        .order_by().values_list('user_agent', flat=True).distinct()
+    )
+    UserAgent.objects.bulk_create(
+        [UserAgent(value=value, value_hash=hashlib.sha256(value.encode()).hexdigest()) for value in values],
+        batch_size=1000,
+    )
+    # Link every activity row in one statement. The lookup by value needs an
+    # index only for the duration; the app itself goes by value_hash.
+    index = models.Index(fields=['value'], name='blog_useragent_value_move')
+    schema_editor.add_index(UserAgent, index)
+    UserActivity.objects.exclude(user_agent='').update(
+        agent=Subquery(UserAgent.objects.filter(value=OuterRef('user_agent')).values('pk')[:1])
+    )
+    schema_editor.remove_index(UserAgent, index)
+
+
+def restore_user_agents(apps, schema_editor):
+    UserActivity = apps.get_model('blog', 'UserActivity')
+    UserAgent = apps.get_model('blog', 'UserAgent')
+    UserActivity.objects.filter(agent__isnull=False).update(
+        user_agent=Subquery(UserAgent.objects.filter(pk=OuterRef('agent')).values('value')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.TextField()),
+                ('value_hash', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='useractivity',
+            name='agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='activities', to='blog.useragent'),
+        ),
+        migrations.RunPython(move_user_agents, restore_user_agents),
+        migrations.RemoveField(
+            model_name='useractivity',
+            name='user_agent',
+        ),
+        migrations.RenameField(
+            model_name='useractivity',
+            old_name='agent',
+            new_name='user_agent',
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxnotification',
+            name='claim_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='outboxnotification',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='outboxnotification',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='outboxnotification',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='outboxnotification',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='blog_outbox_status_1a2cb6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxnotification',
+            index=models.Index(fields=['claim_token'], name='blog_outbox_claim_t_52cee0_idx'),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.urls import reverse
 from django.core.validators import MinLengthValidator
+from django.utils import timezone
+
+from .rendering import render_post
 
 
 class Category(models.Model):
@@ -10,6 +13,8 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(unique=True, max_length=100)
     description = models.TextField(blank=True)
+    # Maintained by blog.counts
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -32,6 +37,8 @@ class Tag(models.Model):
     """Tag model for tagging blog posts"""
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(unique=True, max_length=50)
+    # Maintained by blog.counts
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -49,12 +56,37 @@ class Tag(models.Model):
         return reverse('blog:tag_posts', kwargs={'slug': self.slug})
 
 
+class PostQuerySet(models.QuerySet):
+    """Post queries shared by the views"""
+
+    def published(self):
+        return self.filter(status='published')
+
+    def cards(self, tags=True):
+        """Posts as shown in lists: no body, author and category joined in.
+
+        Tags come from one extra query, loading only what a card shows.
+        """
+        queryset = self.select_related('author', 'category').defer(
+            *Post.CARD_DEFERRED_FIELDS, 'author__password', 'category__description'
+        )
+        if tags:
+            queryset = queryset.prefetch_related(
+                models.Prefetch('tags', queryset=Tag.objects.only('id', 'name', 'slug'))
+            )
+        return queryset
+
+
 class Post(models.Model):
     """Blog Post model"""
     STATUS_CHOICES = [
         ('draft', 'Draft'),
         ('published', 'Published'),
     ]
+    FORMAT_CHOICES = [
+        ('plain', 'Plain text'),
+        ('markdown', 'Markdown'),
+    ]
 
     title = models.CharField(
         max_length=200,
@@ -64,6 +96,15 @@ class Post(models.Model):
     content = models.TextField(
         validators=[MinLengthValidator(50)]
     )
+    content_format = models.CharField(
+        max_length=10,
+        choices=FORMAT_CHOICES,
+        default='plain',
+        help_text="How the content is written"
+    )
+    # Rendered from content on save (see blog.rendering)
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
     excerpt = models.CharField(
         max_length=300,
         blank=True,
@@ -97,6 +138,8 @@ class Post(models.Model):
         default='draft'
     )
     views_count = models.PositiveIntegerField(default=0)
+    # Maintained by blog.counts
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
@@ -108,23 +151,56 @@ class Post(models.Model):
             models.Index(fields=['author']),
             models.Index(fields=['status']),
             models.Index(fields=['-published_at']),
+            # Keyset pagination (see blog.pagination)
+            models.Index(fields=['status', '-published_at', '-id']),
+            models.Index(fields=['category', 'status', '-published_at', '-id']),
+            models.Index(fields=['author', '-created_at', '-id']),
         ]
 
+    objects = PostQuerySet.as_manager()
+
+    # The post body, which list views never show
+    CARD_DEFERRED_FIELDS = ('content', 'content_html', 'content_hash')
+
+    # Fields whose last saved value is remembered so signals can see what changed
+    TRACKED_FIELDS = ('status', 'slug', 'category_id', 'author_id')
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _remember_loaded_values(self):
+        self._loaded_values = {
+            field: self.__dict__.get(field) for field in self.TRACKED_FIELDS
+        }
+
+    def loaded_value(self, field):
+        """Value of a tracked field as last read from or written to the database"""
+        return getattr(self, '_loaded_values', {}).get(field)
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
         
         # Set published_at when status changes to published
         if self.status == 'published' and not self.published_at:
-            from django.utils import timezone
             self.published_at = timezone.now()
         elif self.status == 'draft':
             self.published_at = None
-            
+
+        # Render the body here once instead of on every page view
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'content', 'content_format'} & set(update_fields):
+            if render_post(self) and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html', 'content_hash'}
+
         super().save(*args, **kwargs)
+        self._remember_loaded_values()
 
     def get_absolute_url(self):
         return reverse('blog:post_detail', kwargs={'slug': self.slug})
@@ -134,9 +210,10 @@ class Post(models.Model):
         return self.status == 'published'
 
     def increment_views(self):
-        """Increment view count for the post"""
+        """Record a view; the database is updated when the view buffer flushes"""
+        from .counters import record_view
+        record_view(self.pk)
         self.views_count += 1
-        self.save(update_fields=['views_count'])
 
 
 class Comment(models.Model):
@@ -157,6 +234,14 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    # Replies are one level deep: a reply to a reply joins the same thread
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies'
+    )
     content = models.TextField(
         validators=[MinLengthValidator(2)]
     )
@@ -173,6 +258,9 @@ class Comment(models.Model):
         indexes = [
             models.Index(fields=['post', 'status']),
             models.Index(fields=['user']),
+            # Keyset pages of threads and of their replies (see blog.comments)
+            models.Index(fields=['post', 'status', 'parent', '-created_at', '-id']),
+            models.Index(fields=['parent', 'status', 'created_at', 'id']),
         ]
 
     def __str__(self):
@@ -183,6 +271,17 @@ class Comment(models.Model):
         return self.status == 'approved'
 
 
+class UserAgent(models.Model):
+    """Distinct User-Agent header, shared by all activity rows that sent it"""
+    value = models.TextField()
+    # SHA-256 of value; long headers cannot be indexed cheaply themselves
+    value_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.value
+
+
 class UserActivity(models.Model):
     """Track user activity in the blog"""
     ACTIVITY_TYPES = [
@@ -212,15 +311,239 @@ class UserActivity(models.Model):
         related_name='activities'
     )
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    user_agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='activities'
+    )
+    # Set when the event happens, not when the activity sink writes the row
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['activity_type']),
+            models.Index(fields=['created_at']),
         ]
 
     def __str__(self):
         return f"{self.user.username} - {self.get_activity_type_display()}"
+
+
+class DailyPostStats(models.Model):
+    """Activity on a post during one day, rolled up from UserActivity (see blog.rollups)"""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    edits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'Daily post stats'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'date'], name='unique_daily_post_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} on {self.date}"
+
+
+class DailyAuthorStats(models.Model):
+    """Activity on all posts of an author during one day (see blog.rollups)"""
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    edits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'Daily author stats'
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'date'], name='unique_daily_author_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.author.username} on {self.date}"
+
+
+class RollupCheckpoint(models.Model):
+    """High-water mark of a rollup job: the last source row it has processed"""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+class AuthorStats(models.Model):
+    """Dashboard totals of an author, maintained by blog.counts"""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='author_stats'
+    )
+    total_posts = models.PositiveIntegerField(default=0)
+    published_posts = models.PositiveIntegerField(default=0)
+    draft_posts = models.PositiveIntegerField(default=0)
+    total_views = models.PositiveBigIntegerField(default=0)
+    total_comments = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Author stats'
+
+    def __str__(self):
+        return f"Stats for {self.author.username}"
+
+
+class RelatedPost(models.Model):
+    """Precomputed content-similarity neighbour of a post (see blog.related)"""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_links'
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['post', 'rank']
+        indexes = [
+            models.Index(fields=['post', 'rank']),
+            models.Index(fields=['related']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='unique_related_post'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class RelatedTerm(models.Model):
+    """A word of the related-posts vocabulary and the number of posts using it"""
+    term = models.CharField(max_length=100, unique=True)
+    document_frequency = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term} ({self.document_frequency})"
+
+
+class RelatedDocument(models.Model):
+    """A published post's entry in the related-posts index (see blog.related)"""
+    # No database constraint: the row outlives a deleted post until the
+    # background update has taken its terms out of the document frequencies
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='+'
+    )
+    norm = models.FloatField()
+
+    def __str__(self):
+        return f"{self.post_id} ({self.norm:.3f})"
+
+
+class RelatedPosting(models.Model):
+    """Term frequency weight of a term in a post"""
+    document = models.ForeignKey(
+        RelatedDocument,
+        on_delete=models.CASCADE,
+        related_name='postings'
+    )
+    term = models.ForeignKey(
+        RelatedTerm,
+        on_delete=models.CASCADE,
+        related_name='postings'
+    )
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'document'], name='unique_related_posting'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id}: {self.term_id} ({self.weight:.3f})"
+
+
+class OutboxNotification(models.Model):
+    """Email notification queued by a post_save receiver of the change that caused it"""
+    KIND_CHOICES = [
+        ('post_published', 'Post Published'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Failed sends are retried from this time on, with exponential backoff
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set by the worker that claimed the row for sending (see blog.notifications)
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['claim_token']),
+        ]
+        constraints = [
+            # At most one undelivered notification of each kind per post
+            models.UniqueConstraint(
+                fields=['kind', 'post'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_notification',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.post.title} ({self.status})"
@@ -0,0 +1,165 @@
+"""Outbox-backed email notifications.
+
+Signals only insert ``OutboxNotification`` rows; the ``send_notifications``
+management command delivers them in batches over a single SMTP connection.
+The row is written by a post_save receiver, so it commits together with
+the post only when the save runs inside a transaction, as it does in the
+post views and the admin.
+
+A worker first claims a batch by flipping it from ``pending`` to
+``sending`` under its own token, so concurrent workers never send the same
+row. Claims older than ``CLAIM_TIMEOUT`` (a worker that died mid-batch) can
+be taken over. A failed send, including an SMTP server that cannot be
+reached, goes back to ``pending`` with ``next_attempt_at`` pushed out
+exponentially, and is given up on after ``MAX_ATTEMPTS`` tries.
+"""
+import datetime
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutboxNotification
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = datetime.timedelta(minutes=1)
+MAX_RETRY_DELAY = datetime.timedelta(hours=1)
+CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+
+
+def enqueue_notification(kind, post):
+    """Queue a notification unless an identical one is already pending"""
+    notification, created = OutboxNotification.objects.get_or_create(
+        kind=kind,
+        post=post,
+        status='pending',
+    )
+    return notification
+
+
+def build_message(notification, connection):
+    post = notification.post
+    if notification.kind == 'post_published':
+        subject = f"New Post Published: {post.title}"
+        html_message = render_to_string('blog/emails/post_published.html', {
+            'post': post,
+            'author': post.author,
+        })
+        body = f"New post published: {post.title}"
+    else:
+        raise ValueError(f"Unknown notification kind: {notification.kind}")
+
+    admin_email = settings.DEFAULT_FROM_EMAIL
+    message = EmailMultiAlternatives(
+        subject,
+        body,
+        settings.DEFAULT_FROM_EMAIL,
+        [admin_email],
+        connection=connection,
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def claim_batch(batch_size):
+    """Mark up to ``batch_size`` due notifications as sent by this worker and return them"""
+    now = timezone.now()
+    due = (
+        Q(status='pending', next_attempt_at__lte=now)
+        | Q(status='sending', claimed_at__lt=now - CLAIM_TIMEOUT)
+    )
+    candidates = list(
+        OutboxNotification.objects.filter(due).order_by('next_attempt_at', 'pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not candidates:
+        return []
+    token = uuid.uuid4().hex
+    # The status condition is re-checked by the UPDATE: rows another worker
+    # claimed in the meantime are left alone
+    OutboxNotification.objects.filter(due, pk__in=candidates).update(
+        status='sending', claim_token=token, claimed_at=now
+    )
+    return list(
+        OutboxNotification.objects.filter(status='sending', claim_token=token)
+        .select_related('post', 'post__author')
+    )
+
+
+def record_failure(notification, error):
+    notification.last_error = str(error)
+    if notification.attempts >= MAX_ATTEMPTS:
+        notification.status = 'failed'
+    else:
+        notification.status = 'pending'
+        notification.next_attempt_at = timezone.now() + retry_delay(notification.attempts)
+
+
+def deliver_pending(batch_size=50):
+    """Send up to ``batch_size`` due notifications.
+
+    Returns a ``(sent, failed)`` tuple. Failed notifications are retried
+    with backoff until they have been tried ``MAX_ATTEMPTS`` times.
+    """
+    notifications = claim_batch(batch_size)
+    if not notifications:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning('Could not connect to the mail server: %s', e)
+        for notification in notifications:
+            notification.attempts += 1
+            record_failure(notification, e)
+        failed = len(notifications)
+    else:
+        try:
+            for notification in notifications:
+                notification.attempts += 1
+                try:
+                    build_message(notification, connection).send()
+                except Exception as e:
+                    logger.warning('Failed to send notification %s: %s', notification.pk, e)
+                    record_failure(notification, e)
+                    failed += 1
+                else:
+                    notification.status = 'sent'
+                    notification.sent_at = timezone.now()
+                    notification.last_error = ''
+                    sent += 1
+        finally:
+            connection.close()
+
+    # A retry may not go back to pending next to a newer pending row of the
+    # same post (unique_pending_notification); that row will be sent instead
+    retrying = [n for n in notifications if n.status == 'pending']
+    if retrying:
+        superseded = set(
+            OutboxNotification.objects.filter(
+                status='pending', post__in={n.post_id for n in retrying}
+            ).values_list('kind', 'post_id')
+        )
+        for notification in retrying:
+            if (notification.kind, notification.post_id) in superseded:
+                notification.status = 'failed'
+                notification.last_error += ' (superseded by a newer notification)'
+
+    for notification in notifications:
+        notification.claim_token = ''
+    OutboxNotification.objects.bulk_update(notifications, [
+        'status', 'attempts', 'last_error', 'sent_at', 'next_attempt_at', 'claim_token',
+    ])
+    return sent, failed
@@ -0,0 +1,159 @@
+"""Keyset (cursor) pagination for post lists.
+
+Instead of ``OFFSET`` plus a ``COUNT(*)``, each page is fetched with a range
+condition on the ordering columns (``published_at, id`` by default), so a
+deep page costs the same as the first one. Cursors are opaque tokens in the
+``cursor`` query parameter that encode the direction and the ordering values
+of the last (or first) row of the current page.
+
+Views opt in with ``cursor_pagination = True`` or site-wide through
+``BLOG_CURSOR_PAGINATION``; a request carrying a ``cursor`` parameter is
+always answered in cursor mode.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from django.http import Http404
+
+NEXT, PREVIOUS = 'n', 'p'
+
+
+def encode_cursor(direction, values):
+    payload = [direction] + [
+        value.isoformat() if isinstance(value, datetime.datetime) else value
+        for value in values
+    ]
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token, model, fields):
+    """Return ``(direction, values)`` for a cursor token; raise Http404 if it is invalid"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, *raw_values = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in (NEXT, PREVIOUS) or len(raw_values) != len(fields):
+            raise ValueError(token)
+        values = [
+            model._meta.get_field(field).to_python(value)
+            for field, value in zip(fields, raw_values)
+        ]
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        raise Http404('Invalid cursor.')
+    if any(value is None for value in values):
+        raise Http404('Invalid cursor.')
+    return direction, values
+
+
+class CursorPage:
+    """One page of a keyset-paginated list"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, params):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _url(self, cursor):
+        params = self._params.copy()
+        params.pop('page', None)
+        params['cursor'] = cursor
+        return f'?{params.urlencode()}'
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor) if self.next_cursor else None
+
+    @property
+    def previous_url(self):
+        return self._url(self.previous_cursor) if self.previous_cursor else None
+
+    @property
+    def first_url(self):
+        params = self._params.copy()
+        params.pop('page', None)
+        params.pop('cursor', None)
+        return f'?{params.urlencode()}' if params else '?'
+
+
+class CursorPaginationMixin:
+    """ListView mixin that paginates newest-first on ``cursor_fields``"""
+    cursor_pagination = None
+    cursor_fields = ('published_at', 'id')
+
+    def use_cursor_pagination(self, queryset):
+        if not isinstance(queryset, QuerySet):
+            return False
+        if 'cursor' in self.request.GET:
+            return True
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination
+        return getattr(settings, 'BLOG_CURSOR_PAGINATION', False)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination(queryset):
+            return super().paginate_queryset(queryset, page_size)
+
+        first, second = self.cursor_fields
+        token = self.request.GET.get('cursor')
+        direction, values = NEXT, None
+        if token:
+            direction, values = decode_cursor(token, queryset.model, self.cursor_fields)
+
+        if direction == NEXT:
+            ordered = queryset.order_by(f'-{first}', f'-{second}')
+            if values:
+                # (first, second) < values, written so the range on `first` can use an index
+                ordered = ordered.filter(
+                    Q(**{f'{first}__lte': values[0]})
+                    & ~Q(**{first: values[0], f'{second}__gte': values[1]})
+                )
+        else:
+            ordered = queryset.order_by(first, second).filter(
+                Q(**{f'{first}__gte': values[0]})
+                & ~Q(**{first: values[0], f'{second}__lte': values[1]})
+            )
+
+        rows = list(ordered[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if direction == PREVIOUS:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or direction == PREVIOUS:
+                last = rows[-1]
+                next_cursor = encode_cursor(NEXT, [getattr(last, first), getattr(last, second)])
+            if (direction == NEXT and token) or (direction == PREVIOUS and has_more):
+                head = rows[0]
+                previous_cursor = encode_cursor(PREVIOUS, [getattr(head, first), getattr(head, second)])
+
+        page = CursorPage(rows, next_cursor, previous_cursor, self.request.GET)
+        return None, page, rows, False
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get('page_obj')
+        context['cursor_page'] = page if isinstance(page, CursorPage) else None
+        return context
@@ -0,0 +1,314 @@
+"""Content-similarity "related posts".
+
+Every published post is turned into a sparse TF-IDF vector over the words
+of its title, excerpt and body. Similarity between two posts is the cosine
+of their vectors blended with the Jaccard overlap of their tags. The top
+``RELATED_POSTS_PER_POST`` neighbours of each post are stored in
+``RelatedPost`` so the detail page reads them with one indexed query.
+
+The vocabulary is kept in the database as an inverted index: ``RelatedTerm``
+holds each word and how many posts use it, ``RelatedPosting`` the term
+weights of each post and ``RelatedDocument`` the length of its vector.
+``rebuild_related_posts`` recomputes the index and every list in memory.
+Publishing, editing, unpublishing or deleting a post calls
+:func:`update_related_posts`, which updates the index entry of that post and
+rescores only the lists that can change: its own, those it enters and those
+it was in. Lists that are not touched keep the document frequencies they
+were scored with, so run ``manage.py rebuild_related_posts`` now and then
+to let them catch up with a changing vocabulary.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Post, RelatedDocument, RelatedPost, RelatedPosting, RelatedTerm
+from .tasks import run_after_commit, run_once_after_commit
+
+RELATED_POSTS_PER_POST = 6
+TAG_WEIGHT = 0.3
+FIELD_WEIGHTS = {'title': 3, 'excerpt': 2, 'content': 1}
+MAX_TERM_LENGTH = 100
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can did do does doing down during each
+few for from further had has have having he her here hers him his how i if in
+into is it its itself just me more most my no nor not now of off on once only
+or other our out over own same she should so some such than that the their
+them then there these they this those through to too under until up very was
+we were what when where which while who whom why will with you your
+""".split())
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return [
+        word for word in WORD_RE.findall(text.lower())
+        if 2 < len(word) <= MAX_TERM_LENGTH and word not in STOPWORDS
+    ]
+
+
+def term_weights(fields):
+    """Sublinear term frequency of each word of a post's title, excerpt and body"""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for word in tokenize(fields[field] or ''):
+            counts[word] += weight
+    return {term: 1 + math.log(count) for term, count in counts.items()}
+
+
+def inverse_document_frequency(total, frequency):
+    return math.log((1 + total) / (1 + frequency)) + 1
+
+
+def vector_norm(vector):
+    return math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+
+
+def blend(cosine, tags, other_tags):
+    union = tags | other_tags
+    overlap = len(tags & other_tags) / len(union) if union else 0.0
+    return (1 - TAG_WEIGHT) * cosine + TAG_WEIGHT * overlap
+
+
+def top_neighbours(scores, limit=RELATED_POSTS_PER_POST):
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return [(other_id, score) for other_id, score in ranked[:limit] if score > 0]
+
+
+class Corpus:
+    """TF-IDF vectors and an inverted index over all published posts"""
+
+    def __init__(self, documents, tags):
+        self.tags = tags
+        self.weights = {post_id: term_weights(fields) for post_id, fields in documents.items()}
+        self.document_frequency = Counter()
+        for weights in self.weights.values():
+            self.document_frequency.update(weights.keys())
+
+        total = len(documents)
+        idf = {
+            term: inverse_document_frequency(total, frequency)
+            for term, frequency in self.document_frequency.items()
+        }
+        self.norms = {}
+        self.vectors = {}
+        self.postings = defaultdict(list)
+        for post_id, weights in self.weights.items():
+            vector = {term: weight * idf[term] for term, weight in weights.items()}
+            norm = self.norms[post_id] = vector_norm(vector)
+            vector = {term: weight / norm for term, weight in vector.items()}
+            self.vectors[post_id] = vector
+            for term, weight in vector.items():
+                self.postings[term].append((post_id, weight))
+
+    @classmethod
+    def load(cls):
+        documents = {
+            row['id']: row
+            for row in Post.objects.filter(status='published').values('id', 'title', 'excerpt', 'content')
+        }
+        tags = defaultdict(set)
+        links = Post.tags.through.objects.filter(post__status='published').values_list('post_id', 'tag_id')
+        for post_id, tag_id in links:
+            tags[post_id].add(tag_id)
+        return cls(documents, tags)
+
+    def similarities(self, post_id):
+        """Return ``{other_post_id: score}`` for every post sharing a term or tag"""
+        scores = defaultdict(float)
+        for term, weight in self.vectors.get(post_id, {}).items():
+            for other_id, other_weight in self.postings[term]:
+                if other_id != post_id:
+                    scores[other_id] += weight * other_weight
+
+        post_tags = self.tags.get(post_id, set())
+        candidates = set(scores)
+        if post_tags:
+            candidates.update(
+                other_id for other_id, other_tags in self.tags.items()
+                if other_id != post_id and other_tags & post_tags
+            )
+        return {
+            other_id: blend(scores.get(other_id, 0.0), post_tags, self.tags.get(other_id, set()))
+            for other_id in candidates
+        }
+
+    def neighbours(self, post_id, limit=RELATED_POSTS_PER_POST):
+        return top_neighbours(self.similarities(post_id), limit)
+
+    def save_index(self):
+        """Replace the stored vocabulary, term weights and vector norms with this corpus"""
+        RelatedPosting.objects.all().delete()
+        RelatedDocument.objects.all().delete()
+        RelatedTerm.objects.all().delete()
+        RelatedTerm.objects.bulk_create(
+            [RelatedTerm(term=term, document_frequency=frequency) for term, frequency in self.document_frequency.items()],
+            batch_size=1000,
+        )
+        term_ids = dict(RelatedTerm.objects.values_list('term', 'id'))
+        RelatedDocument.objects.bulk_create(
+            [RelatedDocument(post_id=post_id, norm=norm) for post_id, norm in self.norms.items()],
+            batch_size=1000,
+        )
+        RelatedPosting.objects.bulk_create(
+            [
+                RelatedPosting(document_id=post_id, term_id=term_ids[term], weight=weight)
+                for post_id, weights in self.weights.items()
+                for term, weight in weights.items()
+            ],
+            batch_size=1000,
+        )
+
+
+def neighbour_rows(post_id, neighbours):
+    return [
+        RelatedPost(post_id=post_id, related_id=related_id, score=score, rank=rank)
+        for rank, (related_id, score) in enumerate(neighbours, start=1)
+    ]
+
+
+def rebuild_related_posts():
+    """Recompute the index and the neighbour lists of every published post"""
+    corpus = Corpus.load()
+    rows = []
+    for post_id in corpus.vectors:
+        rows.extend(neighbour_rows(post_id, corpus.neighbours(post_id)))
+    with transaction.atomic():
+        corpus.save_index()
+        RelatedPost.objects.all().delete()
+        RelatedPost.objects.bulk_create(rows, batch_size=1000)
+    return len(corpus.vectors)
+
+
+def index_post(post_id):
+    """Bring the stored index entry of a post up to date; return whether it is published"""
+    fields = Post.objects.filter(pk=post_id, status='published').values('title', 'excerpt', 'content').first()
+    weights = term_weights(fields) if fields is not None else {}
+    old_terms = dict(RelatedPosting.objects.filter(document_id=post_id).values_list('term__term', 'term_id'))
+
+    RelatedPosting.objects.filter(document_id=post_id).delete()
+    removed = [term_id for term, term_id in old_terms.items() if term not in weights]
+    if removed:
+        RelatedTerm.objects.filter(pk__in=removed).update(document_frequency=F('document_frequency') - 1)
+        RelatedTerm.objects.filter(pk__in=removed, document_frequency=0).delete()
+    if fields is None:
+        RelatedDocument.objects.filter(pk=post_id).delete()
+        return False
+
+    added = [term for term in weights if term not in old_terms]
+    if added:
+        RelatedTerm.objects.bulk_create([RelatedTerm(term=term) for term in added], ignore_conflicts=True)
+        RelatedTerm.objects.filter(term__in=added).update(document_frequency=F('document_frequency') + 1)
+    document, _ = RelatedDocument.objects.get_or_create(pk=post_id, defaults={'norm': 1.0})
+
+    total = RelatedDocument.objects.count()
+    terms = RelatedTerm.objects.filter(term__in=list(weights)).values_list('term', 'id', 'document_frequency')
+    term_ids = {}
+    vector = {}
+    for term, term_id, frequency in terms:
+        term_ids[term] = term_id
+        vector[term] = weights[term] * inverse_document_frequency(total, frequency)
+    document.norm = vector_norm(vector)
+    document.save(update_fields=['norm'])
+    RelatedPosting.objects.bulk_create([
+        RelatedPosting(document=document, term_id=term_ids[term], weight=weight)
+        for term, weight in weights.items()
+    ])
+    return True
+
+
+def similarities(post_id):
+    """Score every indexed post sharing a term or tag with ``post_id`` from the stored index"""
+    document = RelatedDocument.objects.filter(pk=post_id).first()
+    if document is None:
+        return {}
+
+    total = RelatedDocument.objects.count()
+    terms = {
+        term_id: (weight, inverse_document_frequency(total, frequency))
+        for term_id, weight, frequency in RelatedPosting.objects.filter(document=document).values_list(
+            'term_id', 'weight', 'term__document_frequency'
+        )
+    }
+    cosine = defaultdict(float)
+    postings = RelatedPosting.objects.filter(term_id__in=list(terms)).exclude(document=document)
+    for other_id, term_id, other_weight in postings.values_list('document_id', 'term_id', 'weight'):
+        weight, idf = terms[term_id]
+        cosine[other_id] += weight * other_weight * idf * idf
+    norms = dict(RelatedDocument.objects.filter(pk__in=list(cosine)).values_list('pk', 'norm'))
+    for other_id in cosine:
+        cosine[other_id] /= document.norm * norms[other_id]
+
+    links = Post.tags.through.objects
+    post_tags = set(links.filter(post_id=post_id).values_list('tag_id', flat=True))
+    tags = defaultdict(set)
+    if post_tags:
+        sharing = links.filter(tag_id__in=post_tags).values('post_id')
+        others = links.filter(post_id__in=sharing, post__status='published').exclude(post_id=post_id)
+        for other_id, tag_id in others.values_list('post_id', 'tag_id'):
+            tags[other_id].add(tag_id)
+
+    return {
+        other_id: blend(cosine.get(other_id, 0.0), post_tags, tags.get(other_id, set()))
+        for other_id in set(cosine) | set(tags)
+    }
+
+
+def update_related_posts(post_id, former_owners=()):
+    """Refresh the lists affected by a post being published, edited, unpublished or deleted.
+
+    The post's own list is rescored, the post is inserted into the lists it
+    now enters, and its score is updated in the lists that contain it. A
+    list the post drops out of is rescored in full, since the post's place
+    goes to a neighbour that list does not know yet. ``former_owners`` are
+    the posts whose lists held a deleted post before the delete cascaded.
+    """
+    with transaction.atomic():
+        published = index_post(post_id)
+        scores = similarities(post_id) if published else {}
+        owners = set(RelatedPost.objects.filter(related_id=post_id).values_list('post_id', flat=True))
+        owners.update(former_owners)
+        owners.discard(post_id)
+
+        current = defaultdict(dict)
+        rows = RelatedPost.objects.filter(post_id__in=owners | set(scores)).values_list('post_id', 'related_id', 'score')
+        for owner_id, related_id, score in rows:
+            current[owner_id][related_id] = score
+
+        lists = {post_id: top_neighbours(scores)}
+        for owner_id in owners:
+            related = current[owner_id]
+            was_full = len(related) >= RELATED_POSTS_PER_POST
+            others = {other_id: score for other_id, score in related.items() if other_id != post_id}
+            score = scores.get(owner_id, 0.0)
+            if score > 0 and (not was_full or (others and score >= min(others.values()))):
+                lists[owner_id] = top_neighbours({**others, post_id: score})
+            else:
+                lists[owner_id] = top_neighbours(similarities(owner_id))
+        for owner_id, score in scores.items():
+            related = current[owner_id]
+            if owner_id in owners or score <= 0:
+                continue
+            if len(related) < RELATED_POSTS_PER_POST or score > min(related.values()):
+                lists[owner_id] = top_neighbours({**related, post_id: score})
+
+        RelatedPost.objects.filter(post_id__in=list(lists)).delete()
+        RelatedPost.objects.bulk_create(
+            [row for owner_id, neighbours in lists.items() for row in neighbour_rows(owner_id, neighbours)],
+            batch_size=1000,
+        )
+
+
+def schedule_related_update(post_id):
+    """Update related posts after commit, once per post however often it is saved"""
+    run_once_after_commit(update_related_posts, post_id)
+
+
+def schedule_related_removal(post_id, former_owners):
+    """Take a deleted post out of the index and refill the lists that held it"""
+    run_after_commit(update_related_posts, post_id, former_owners)
@@ -0,0 +1,111 @@
+"""Render post bodies to HTML once, at save time.
+
+``Post.content_html`` holds the rendered body and ``Post.content_hash`` a
+digest of the renderer version, source format and source text. Saving a
+post only re-renders when that digest changes, and bumping
+``RENDERER_VERSION`` (then running ``manage.py rerender_posts``) refreshes
+every stored body after the renderer itself changes.
+
+Plain text is rendered exactly like the ``linebreaks`` template filter.
+Markdown uses Python-Markdown with raw HTML disabled, so authors cannot
+inject markup, and links or images whose scheme is not known to be safe are
+dropped. The scheme is read the way a browser reads it: after decoding
+character references and ignoring whitespace and control characters, so
+``java&#115;cript:`` or ``java<TAB>script:`` count as ``javascript:``.
+"""
+import hashlib
+import html
+import re
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.html import linebreaks
+
+RENDERER_VERSION = 2
+
+PLAIN, MARKDOWN = 'plain', 'markdown'
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+SAFE_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+# Browsers skip these anywhere in a URL's scheme
+IGNORED_URL_CHARACTERS = re.compile(r'[\x00-\x20\x7f-\x9f]+')
+
+
+def content_hash(content, content_format):
+    raw = f'{RENDERER_VERSION}:{content_format}:{content}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def is_safe_url(url):
+    """Whether ``url``, as written in an HTML attribute, has a safe scheme"""
+    try:
+        scheme = urlsplit(IGNORED_URL_CHARACTERS.sub('', html.unescape(url))).scheme
+    except ValueError:
+        return False
+    return scheme.lower() in SAFE_URL_SCHEMES
+
+
+def _safe_markdown():
+    try:
+        import markdown
+        from markdown.extensions import Extension
+        from markdown.treeprocessors import Treeprocessor
+    except ImportError:
+        raise ImproperlyConfigured('Rendering Markdown posts requires the "Markdown" package.')
+
+    class DropUnsafeUrls(Treeprocessor):
+        def run(self, root):
+            for element in root.iter():
+                for attribute in ('href', 'src'):
+                    url = element.get(attribute)
+                    if url is not None and not is_safe_url(url):
+                        del element.attrib[attribute]
+
+    class SafeMarkdown(Extension):
+        def extendMarkdown(self, md):
+            # Without these, raw HTML in the source is escaped as text
+            md.preprocessors.deregister('html_block')
+            md.inlinePatterns.deregister('html')
+            md.treeprocessors.register(DropUnsafeUrls(md), 'drop_unsafe_urls', 0)
+
+    return markdown.Markdown(extensions=[*MARKDOWN_EXTENSIONS, SafeMarkdown()])
+
+
+def render_content(content, content_format):
+    if content_format == MARKDOWN:
+        return _safe_markdown().convert(content)
+    return linebreaks(content, autoescape=True)
+
+
+def render_post(post, force=False):
+    """Refresh ``post.content_html``; return whether it had to be re-rendered"""
+    digest = content_hash(post.content, post.content_format)
+    if not force and digest == post.content_hash:
+        return False
+    post.content_html = render_content(post.content, post.content_format)
+    post.content_hash = digest
+    return True
+
+
+def rerender_posts(force=False, batch_size=500):
+    """Re-render stored bodies that are stale; return how many changed"""
+    from .caching import invalidate_all_pages
+    from .models import Post
+
+    # bulk_update skips auto_now, and updated_at is what conditional GETs
+    # and cached post cards go by
+    fields = ['content_html', 'content_hash', 'updated_at']
+    changed, batch = 0, []
+    posts = Post.objects.only('content', 'content_format', 'content_hash').order_by('pk')
+    for post in posts.iterator(chunk_size=batch_size):
+        if render_post(post, force=force):
+            post.updated_at = timezone.now()
+            batch.append(post)
+        if len(batch) >= batch_size:
+            changed += Post.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        changed += Post.objects.bulk_update(batch, fields)
+    if changed:
+        invalidate_all_pages()
+    return changed
@@ -0,0 +1,111 @@
+"""Retention policy for the ``UserActivity`` event log.
+
+The activity table only needs to hold recent events: the dashboards read
+the daily rollups (see ``blog.rollups``), so older rows just make the
+table and its ``(user, -created_at)`` index bigger. ``manage.py
+prune_activity`` moves events older than ``BLOG_ACTIVITY_RETENTION_DAYS``
+out of the database into gzip-compressed JSON Lines files under
+``BLOG_ACTIVITY_ARCHIVE_DIR``, partitioned by day::
+
+    <archive dir>/2026/03/2026-03-14/activity-<first id>-<last id>.jsonl.gz
+
+Only whole days are pruned, and only events the rollup job has already
+processed, so the rollups of pruned days stay exact. Each batch is written
+to its archive file before its rows are deleted; a batch interrupted
+between the two is simply archived again (to the same file) on the next
+run.
+"""
+import datetime
+import gzip
+import json
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import RollupCheckpoint, UserActivity
+from .rollups import CHECKPOINT_NAME, day_bounds
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'activity_type', 'post_id', 'ip_address', 'user_agent__value', 'created_at')
+
+
+def retention_days():
+    return getattr(settings, 'BLOG_ACTIVITY_RETENTION_DAYS', 90)
+
+
+def archive_dir():
+    return getattr(settings, 'BLOG_ACTIVITY_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive', 'activity'))
+
+
+def cutoff_day(days=None):
+    """First day kept in the database"""
+    days = retention_days() if days is None else days
+    return timezone.localdate() - datetime.timedelta(days=days)
+
+
+def prunable_activity(days=None):
+    """Events older than the retention window that have been rolled up"""
+    cutoff, _ = day_bounds(cutoff_day(days))
+    checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    last_rolled_up = checkpoint.last_id if checkpoint else 0
+    return UserActivity.objects.filter(created_at__lt=cutoff, pk__lte=last_rolled_up)
+
+
+def archive_path(day, first_id, last_id, directory=None):
+    return os.path.join(
+        directory or archive_dir(),
+        f'{day:%Y}', f'{day:%m}', day.isoformat(),
+        f'activity-{first_id}-{last_id}.jsonl.gz',
+    )
+
+
+def write_archive(path, rows):
+    """Write ``rows`` as gzipped JSON Lines, replacing ``path`` atomically"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.part'
+    with open(partial, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            for row in rows:
+                row['user_agent'] = row.pop('user_agent__value') or ''
+                row['created_at'] = row['created_at'].isoformat()
+                archive.write(json.dumps(row, separators=(',', ':')).encode() + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+
+
+def prune_day(events, day, batch_size, directory=None):
+    """Archive and delete the events of ``day`` in batches; return how many"""
+    start, end = day_bounds(day)
+    day_events = events.filter(created_at__gte=start, created_at__lt=end).order_by('pk')
+    pruned = 0
+    while True:
+        rows = list(day_events.values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            return pruned
+        first_id, last_id = rows[0]['id'], rows[-1]['id']
+        write_archive(archive_path(day, first_id, last_id, directory), rows)
+        with transaction.atomic():
+            deleted, _ = day_events.filter(pk__range=(first_id, last_id)).delete()
+        pruned += deleted
+
+
+def prune_activity(days=None, batch_size=5000, directory=None, dry_run=False):
+    """Archive and delete events past the retention window; return how many.
+
+    With ``dry_run`` nothing is written and the count of prunable events is
+    returned.
+    """
+    events = prunable_activity(days)
+    if dry_run:
+        return events.count()
+    first = events.aggregate(first=Min('created_at'))['first']
+    if first is None:
+        return 0
+    pruned, day, last_day = 0, timezone.localdate(first), cutoff_day(days)
+    while day < last_day:
+        pruned += prune_day(events, day, batch_size, directory)
+        day += datetime.timedelta(days=1)
+    return pruned
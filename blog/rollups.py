@@ -0,0 +1,136 @@
+"""Daily analytics rollups of the ``UserActivity`` event log.
+
+``rollup_activity`` reads the events added since its high-water mark (a
+``RollupCheckpoint`` row holding the last processed ``UserActivity`` id)
+and rewrites the ``DailyPostStats`` and ``DailyAuthorStats`` rows of the
+posts, authors and days those events touch. Touched buckets are recomputed
+from all of that day's events rather than incremented, which keeps unique
+viewer counts exact and makes re-running a batch harmless.
+
+Views are the ``view_post`` events, i.e. views by signed-in readers;
+anonymous views only reach ``Post.views_count``. Author rows count the
+activity on that author's posts.
+
+Reports (the author dashboard chart, the admin) read only the rollup
+tables. Run ``manage.py rollup_activity`` from a scheduled task.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyAuthorStats, DailyPostStats, RollupCheckpoint, UserActivity
+
+CHECKPOINT_NAME = 'activity'
+METRICS = ('views', 'unique_viewers', 'comments', 'edits')
+
+
+def _metrics():
+    return {
+        'views': Count('pk', filter=Q(activity_type='view_post')),
+        'unique_viewers': Count('user', filter=Q(activity_type='view_post'), distinct=True),
+        'comments': Count('pk', filter=Q(activity_type='comment_post')),
+        'edits': Count('pk', filter=Q(activity_type='edit_post')),
+    }
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def _upsert(model, key, rows):
+    model.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=[key, 'date'],
+        update_fields=list(METRICS),
+    )
+
+
+def rollup_day(day, post_ids, author_ids, last_id):
+    """Recompute the given posts' and authors' buckets of ``day`` up to event ``last_id``"""
+    start, end = day_bounds(day)
+    events = UserActivity.objects.filter(
+        created_at__gte=start, created_at__lt=end, pk__lte=last_id
+    ).order_by()
+    post_rows = events.filter(post_id__in=post_ids).values('post_id').annotate(**_metrics())
+    _upsert(DailyPostStats, 'post', [
+        DailyPostStats(date=day, **row) for row in post_rows
+    ])
+    author_rows = (
+        events.filter(post__author_id__in=author_ids)
+        .values('post__author_id').annotate(**_metrics())
+    )
+    _upsert(DailyAuthorStats, 'author', [
+        DailyAuthorStats(
+            author_id=row.pop('post__author_id'), date=day, **row
+        ) for row in author_rows
+    ])
+
+
+def rollup_batch(checkpoint, batch_size):
+    """Roll up the next ``batch_size`` events; return how many were read"""
+    event_ids = list(
+        UserActivity.objects.filter(pk__gt=checkpoint.last_id)
+        .order_by('pk').values_list('pk', flat=True)[:batch_size]
+    )
+    if not event_ids:
+        return 0
+    last_id = event_ids[-1]
+
+    touched = defaultdict(lambda: (set(), set()))
+    buckets = (
+        UserActivity.objects.filter(pk__gt=checkpoint.last_id, pk__lte=last_id, post__isnull=False)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day', 'post_id', 'post__author_id')
+        .order_by()
+        .distinct()
+    )
+    for day, post_id, author_id in buckets:
+        post_ids, author_ids = touched[day]
+        post_ids.add(post_id)
+        author_ids.add(author_id)
+
+    with transaction.atomic():
+        for day, (post_ids, author_ids) in sorted(touched.items()):
+            rollup_day(day, post_ids, author_ids, last_id)
+        checkpoint.last_id = last_id
+        checkpoint.save(update_fields=['last_id', 'updated_at'])
+    return len(event_ids)
+
+
+def rollup_activity(batch_size=10000):
+    """Roll up every event added since the last run; return how many were processed"""
+    checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    processed = 0
+    while True:
+        count = rollup_batch(checkpoint, batch_size)
+        processed += count
+        if count < batch_size:
+            return processed
+
+
+def author_daily_series(author, days=30):
+    """Daily rollup rows of ``author`` for the last ``days`` days, oldest first.
+
+    Days without activity are filled with zeros; each entry also carries
+    ``height``, its views as a percentage of the busiest day, for charts.
+    """
+    today = timezone.localdate()
+    first_day = today - datetime.timedelta(days=days - 1)
+    rows = {
+        row['date']: row
+        for row in DailyAuthorStats.objects.filter(author=author, date__gte=first_day).values('date', *METRICS)
+    }
+    series = [
+        rows.get(day) or {'date': day, **dict.fromkeys(METRICS, 0)}
+        for day in (first_day + datetime.timedelta(days=offset) for offset in range(days))
+    ]
+    peak = max(entry['views'] for entry in series) or 1
+    for entry in series:
+        entry['height'] = round(100 * entry['views'] / peak)
+    return series
@@ -0,0 +1,84 @@
+"""Read replica routing.
+
+``ReplicaRouter`` sends the reads of web requests to one of the database
+aliases in ``BLOG_DATABASE_REPLICAS`` and every write to ``default``.
+Replicas lag behind the primary, so a request reads from the primary when
+
+* it has already written something (later reads must see that write),
+* it is inside a transaction on the primary, or
+* it carries the pin cookie: ``ReplicaPinningMiddleware`` sets it for
+  ``BLOG_REPLICA_PIN_SECONDS`` after any request that wrote, so an author
+  who just saved a post sees it on the next page.
+
+Only requests passing through the middleware use replicas at all;
+management commands and background tasks always read from the primary.
+With no replicas configured the router changes nothing.
+
+``manage.py sync_sqlite_replicas`` refreshes file-copy SQLite replicas,
+which is enough to exercise all of this locally.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Session rows are written on login and read on the very next request
+PRIMARY_ONLY_APPS = {'sessions'}
+
+# None outside requests; inside one, whether its reads must use the primary
+_use_primary = contextvars.ContextVar('blog_use_primary', default=None)
+_wrote = contextvars.ContextVar('blog_wrote', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in getattr(settings, 'BLOG_DATABASE_REPLICAS', ()) if alias in settings.DATABASES]
+
+
+def start_request(pinned):
+    """Mark the current context as a web request; return tokens for :func:`end_request`"""
+    return _use_primary.set(pinned), _wrote.set(False)
+
+
+def end_request(tokens):
+    """Return whether the request wrote to the primary, and leave its context"""
+    wrote = _wrote.get()
+    use_primary_token, wrote_token = tokens
+    _use_primary.reset(use_primary_token)
+    _wrote.reset(wrote_token)
+    return wrote
+
+
+def reads_from_primary():
+    return (
+        _use_primary.get() in (None, True)
+        or _wrote.get()
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class ReplicaRouter:
+    """Route request reads to replicas and all writes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or model._meta.app_label in PRIMARY_ONLY_APPS or reads_from_primary():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if _use_primary.get() is not None:
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated themselves
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,241 @@
+"""Full-text search over published posts.
+
+The backend is chosen from the database in use:
+
+* SQLite: an FTS5 virtual table ``blog_post_fts`` whose rowid is the post id,
+  ranked with BM25.
+* PostgreSQL: a ``search_document`` tsvector column on ``blog_post`` with a
+  GIN index, ranked with ``ts_rank_cd``.
+* Anything else (or SQLite built without FTS5) falls back to ``icontains``
+  filtering ordered by publication date.
+
+Both index-backed variants are created by migration ``0004`` and kept in
+sync by the ``Post`` save/delete signals. ``manage.py rebuild_search_index``
+repopulates them from scratch.
+"""
+import re
+
+from django.conf import settings
+from django.db import OperationalError, connections, router
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+# Weights for the title, excerpt and content columns
+TITLE_WEIGHT, EXCERPT_WEIGHT, CONTENT_WEIGHT = 10.0, 5.0, 1.0
+
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+
+
+def max_results():
+    """Most results a search lists; backends return one more so a cut-off shows"""
+    return getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 1000)
+
+
+def render_highlight(text):
+    """Escape backend output and turn its highlight markers into <mark> tags"""
+    return mark_safe(
+        escape(text)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+class DatabaseSearchBackend:
+    """Substring search used when no full-text index is available"""
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def search(self, query, category_id=None, tag_id=None):
+        queryset = Post.objects.filter(status='published').filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(excerpt__icontains=query)
+        )
+        if category_id:
+            queryset = queryset.filter(category_id=category_id)
+        if tag_id:
+            queryset = queryset.filter(tags__id=tag_id)
+        return list(queryset.values_list('pk', flat=True).distinct()[:max_results() + 1])
+
+    def snippets(self, query, post_ids):
+        return {}
+
+
+class SQLiteSearchBackend:
+    """SQLite FTS5 backend"""
+    table = 'blog_post_fts'
+
+    def _write_connection(self):
+        return connections[router.db_for_write(Post)]
+
+    def _read_connection(self):
+        return connections[router.db_for_read(Post)]
+
+    @staticmethod
+    def match_expression(query):
+        """Quote every word so user input cannot use FTS5 query syntax"""
+        terms = re.findall(r'\w+', query)
+        return ' '.join('"%s"' % term for term in terms)
+
+    def index(self, post):
+        with self._write_connection().cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk])
+            if post.status == 'published':
+                cursor.execute(
+                    f'INSERT INTO {self.table} (rowid, title, excerpt, content) VALUES (%s, %s, %s, %s)',
+                    [post.pk, post.title, post.excerpt, post.content],
+                )
+
+    def remove(self, post_id):
+        with self._write_connection().cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post_id])
+
+    def rebuild(self):
+        with self._write_connection().cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, excerpt, content) '
+                f"SELECT id, title, excerpt, content FROM blog_post WHERE status = 'published'"
+            )
+            return cursor.rowcount
+
+    def search(self, query, category_id=None, tag_id=None):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        joins, where, params = [], [], [match]
+        if tag_id:
+            joins.append('INNER JOIN blog_post_tags ON blog_post_tags.post_id = blog_post.id')
+            where.append('blog_post_tags.tag_id = %s')
+            params.append(tag_id)
+        if category_id:
+            where.append('blog_post.category_id = %s')
+            params.append(category_id)
+        sql = (
+            f'SELECT blog_post.id FROM {self.table} '
+            f'INNER JOIN blog_post ON blog_post.id = {self.table}.rowid '
+            f'{" ".join(joins)} '
+            f"WHERE {self.table} MATCH %s AND blog_post.status = 'published' "
+            f'{"".join(" AND " + clause for clause in where)} '
+            f'ORDER BY bm25({self.table}, {TITLE_WEIGHT}, {EXCERPT_WEIGHT}, {CONTENT_WEIGHT}) '
+            f'LIMIT {max_results() + 1:d}'
+        )
+        with self._read_connection().cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def snippets(self, query, post_ids):
+        match = self.match_expression(query)
+        if not match or not post_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        sql = (
+            f"SELECT rowid, snippet({self.table}, 2, char(2), char(3), '…', 32) "
+            f'FROM {self.table} WHERE {self.table} MATCH %s AND rowid IN ({placeholders})'
+        )
+        with self._read_connection().cursor() as cursor:
+            cursor.execute(sql, [match, *post_ids])
+            return {post_id: render_highlight(text) for post_id, text in cursor.fetchall()}
+
+
+class PostgresSearchBackend:
+    """PostgreSQL tsvector backend"""
+    config = 'english'
+    document_sql = (
+        "setweight(to_tsvector(%(config)s, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector(%(config)s, coalesce(excerpt, '')), 'B') || "
+        "setweight(to_tsvector(%(config)s, coalesce(content, '')), 'C')"
+    )
+
+    def _document(self):
+        return self.document_sql % {'config': f"'{self.config}'"}
+
+    def index(self, post):
+        with connections[router.db_for_write(Post)].cursor() as cursor:
+            cursor.execute(
+                f'UPDATE blog_post SET search_document = {self._document()} WHERE id = %s',
+                [post.pk],
+            )
+
+    def remove(self, post_id):
+        pass  # The document lives on the post row itself
+
+    def rebuild(self):
+        with connections[router.db_for_write(Post)].cursor() as cursor:
+            cursor.execute(f'UPDATE blog_post SET search_document = {self._document()}')
+            return cursor.rowcount
+
+    def search(self, query, category_id=None, tag_id=None):
+        joins, where, params = [], [], [self.config, query]
+        if tag_id:
+            joins.append('INNER JOIN blog_post_tags ON blog_post_tags.post_id = blog_post.id')
+            where.append('blog_post_tags.tag_id = %s')
+            params.append(tag_id)
+        if category_id:
+            where.append('blog_post.category_id = %s')
+            params.append(category_id)
+        sql = (
+            'SELECT blog_post.id FROM blog_post '
+            'CROSS JOIN websearch_to_tsquery(%s, %s) AS query '
+            f'{" ".join(joins)} '
+            "WHERE blog_post.search_document @@ query AND blog_post.status = 'published' "
+            f'{"".join(" AND " + clause for clause in where)} '
+            'ORDER BY ts_rank_cd(blog_post.search_document, query) DESC '
+            f'LIMIT {max_results() + 1:d}'
+        )
+        with connections[router.db_for_read(Post)].cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def snippets(self, query, post_ids):
+        if not post_ids:
+            return {}
+        sql = (
+            'SELECT id, ts_headline(%s, content, websearch_to_tsquery(%s, %s), '
+            "'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxWords=35, MinWords=15') "
+            'FROM blog_post WHERE id = ANY(%s)'
+        )
+        with connections[router.db_for_read(Post)].cursor() as cursor:
+            cursor.execute(sql, [self.config, self.config, query, list(post_ids)])
+            return {post_id: render_highlight(text) for post_id, text in cursor.fetchall()}
+
+
+def fts5_available(connection):
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [SQLiteSearchBackend.table],
+            )
+            return cursor.fetchone() is not None
+        except OperationalError:
+            return False
+
+
+_backends = {}
+
+
+def get_search_backend():
+    """Return the search backend for the database posts are read from"""
+    alias = router.db_for_read(Post)
+    backend = _backends.get(alias)
+    if backend is None:
+        connection = connections[alias]
+        if connection.vendor == 'sqlite' and fts5_available(connection):
+            backend = SQLiteSearchBackend()
+        elif connection.vendor == 'postgresql':
+            backend = PostgresSearchBackend()
+        else:
+            backend = DatabaseSearchBackend()
+        _backends[alias] = backend
+    return backend
@@ -1,36 +1,199 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
-from .models import Post
+from django.utils import timezone
+from .models import Post, Comment, Category, Tag, RelatedPost
+from .caching import (
+    invalidate_post_pages, invalidate_all_pages, invalidate_sidebar, invalidate_search_results,
+)
+from .counts import (
+    author_stats_enabled, refresh_author_stats, refresh_category_counts, refresh_comment_counts,
+    refresh_post_author_stats, refresh_tag_counts,
+)
+from .images import ensure_derivatives
+from .notifications import enqueue_notification
+from .related import schedule_related_removal, schedule_related_update
+from .search import get_search_backend
+from .sqlite import configure_connection
 from accounts.models import UserProfile
 
 
 @receiver(post_save, sender=Post)
-def post_published_signal(sender, instance, created, **kwargs):
-    """Send notification when a post is published"""
-    if instance.status == 'published' and instance.published_at:
-        # Send email to admin
-        subject = f"New Post Published: {instance.title}"
-        html_message = render_to_string('blog/emails/post_published.html', {
-            'post': instance,
-            'author': instance.author,
-        })
-        
-        # Send to admin
-        admin_email = settings.DEFAULT_FROM_EMAIL
-        try:
-            send_mail(
-                subject,
-                f"New post published: {instance.title}",
-                settings.DEFAULT_FROM_EMAIL,
-                [admin_email],
-                html_message=html_message,
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Error sending email: {e}")
+def post_published_signal(sender, instance, created, update_fields=None, **kwargs):
+    """Queue a notification when a post moves from draft to published"""
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    if instance.status != 'published' or instance.loaded_value('status') == 'published':
+        return
+    # Commits with the post when the save runs in a transaction (post views,
+    # admin); delivered by `manage.py send_notifications`
+    enqueue_notification('post_published', instance)
+
+
+def is_public(post):
+    return post.status == 'published' or post.loaded_value('status') == 'published'
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_cache_on_save(sender, instance, update_fields=None, **kwargs):
+    """Purge cached pages showing a post that is or was published"""
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    if is_public(instance):
+        invalidate_post_pages(instance, instance.tags.values_list('slug', flat=True))
+        invalidate_sidebar()
+
+
+@receiver(pre_delete, sender=Post)
+def invalidate_post_cache_on_delete(sender, instance, **kwargs):
+    # pre_delete: the post's tag links are removed before post_delete fires
+    if is_public(instance):
+        invalidate_post_pages(instance, instance.tags.values_list('slug', flat=True))
+        invalidate_sidebar()
+
+
+@receiver(pre_delete, sender=Post)
+def refresh_related_posts_on_delete(sender, instance, **kwargs):
+    # The delete cascades to the neighbour lists holding the post, so
+    # remember whose lists need a replacement while they still exist
+    owners = list(RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True))
+    schedule_related_removal(instance.pk, owners)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_post_cache_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        invalidate_all_pages()
+        invalidate_sidebar()
+        invalidate_search_results()
+    elif is_public(instance):
+        # Cached post cards list the tags but go by updated_at, which
+        # changing them does not move
+        instance.updated_at = timezone.now()
+        Post.objects.filter(pk=instance.pk).update(updated_at=instance.updated_at)
+        tags = Tag.objects.filter(pk__in=pk_set) if pk_set else instance.tags.all()
+        invalidate_post_pages(instance, tags.values_list('slug', flat=True))
+        invalidate_sidebar()
+        invalidate_search_results()
+        schedule_related_update(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    if is_public(instance):
+        get_search_backend().index(instance)
+        invalidate_search_results()
+        schedule_related_update(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+    invalidate_search_results()
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_cache(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None and is_public(post):
+        # Tag pages show the comment count too
+        invalidate_post_pages(post, post.tags.values_list('slug', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_taxonomy_cache(sender, instance, **kwargs):
+    # Category and tag names appear on most pages and change rarely
+    invalidate_all_pages()
+    invalidate_sidebar()
+    invalidate_search_results()
+
+
+@receiver(post_save, sender=Post)
+def update_counts_on_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """Recount categories and tags when a post is (un)published or recategorised"""
+    fields = set(update_fields) if update_fields is not None else None
+    if not created and (fields is None or 'approved_comment_count' in fields):
+        # A full save writes back whatever count the instance was loaded with
+        refresh_comment_counts([instance.pk])
+    if fields is not None and not {'status', 'category'} & fields:
+        return
+    status_changed = instance.status != instance.loaded_value('status')
+    if status_changed or instance.category_id != instance.loaded_value('category_id'):
+        refresh_category_counts({instance.category_id, instance.loaded_value('category_id')})
+    if status_changed and not created:
+        refresh_tag_counts(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Post)
+def remember_counts_on_post_delete(sender, instance, **kwargs):
+    instance._counted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def update_counts_on_post_delete(sender, instance, **kwargs):
+    if is_public(instance):
+        refresh_category_counts([instance.category_id])
+        refresh_tag_counts(getattr(instance, '_counted_tag_ids', None) or [])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_counts_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_tag_counts([instance.pk])
+    elif action == 'pre_clear':
+        instance._counted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    elif instance.status == 'published':
+        if action in ('post_add', 'post_remove'):
+            refresh_tag_counts(pk_set)
+        elif action == 'post_clear':
+            refresh_tag_counts(getattr(instance, '_counted_tag_ids', None) or [])
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def update_comment_count(sender, instance, **kwargs):
+    refresh_comment_counts([instance.post_id])
+    # After commit: when a user is deleted, a refresh inside the cascade
+    # would recreate the AuthorStats row the cascade has just removed
+    transaction.on_commit(lambda: refresh_post_author_stats([instance.post_id]))
+
+
+@receiver([post_save, post_delete], sender=Post)
+def update_author_stats(sender, instance, update_fields=None, **kwargs):
+    if author_stats_enabled():
+        author_ids = {instance.author_id, instance.loaded_value('author_id')}
+        transaction.on_commit(lambda: refresh_author_stats(author_ids))
+
+
+@receiver(post_save, sender=Category)
+def update_category_count(sender, instance, created, **kwargs):
+    # The save wrote back the count the instance was loaded with, which may be stale
+    if not created:
+        refresh_category_counts([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_count(sender, instance, created, **kwargs):
+    if not created:
+        refresh_tag_counts([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+def generate_featured_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'featured_image' in update_fields:
+        ensure_derivatives(instance.featured_image)
+
+
+@receiver(post_save, sender=UserProfile)
+def generate_avatar_derivatives(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'avatar' in update_fields:
+        ensure_derivatives(instance.avatar)
 
 
 @receiver(post_save, sender=UserProfile)
@@ -41,6 +204,13 @@ def create_default_permissions(sender, instance, created, **kwargs):
         pass
 
 
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply BLOG_SQLITE_PROFILE pragmas to new SQLite connections"""
+    configure_connection(connection)
+
+
 # Import signals when app is ready
 def ready():
     import blog.signals
+
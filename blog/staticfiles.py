@@ -0,0 +1,133 @@
+"""Static file storage and serving.
+
+``CompressedManifestStaticFilesStorage`` is Django's manifest storage
+(content-hashed file names such as ``base.3f2a9c1b.css``) that also writes
+``.gz`` and, when the ``brotli`` package is installed, ``.br`` copies of
+text assets during ``collectstatic``.
+
+``StaticFilesApplication`` wraps the WSGI application to serve
+``STATIC_ROOT`` directly when no web server or proxy sits in front of
+Django. It picks the precompressed variant the client accepts and marks
+hashed files as cacheable forever. Enable it with ``BLOG_SERVE_STATIC``.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate
+from urllib.parse import unquote
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.xml', '.json', '.map', '.html', '.ico')
+MIN_COMPRESS_SIZE = 256
+CHUNK_SIZE = 64 * 1024
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+
+
+def compressors():
+    yield 'gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield 'br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that precompresses text assets"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(names):
+                if name.endswith(COMPRESS_EXTENSIONS):
+                    self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            target = f'{name}.{suffix}'
+            if self.exists(target):
+                self.delete(target)
+            # Only keep variants that are actually smaller
+            if len(compressed) < len(data):
+                self._save(target, ContentFile(compressed))
+
+
+class StaticFilesApplication:
+    """WSGI middleware serving files under ``prefix`` from ``root``"""
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, application, root, prefix, immutable_names=()):
+        self.application = application
+        self.root = os.path.realpath(root)
+        self.prefix = prefix if prefix.endswith('/') else prefix + '/'
+        self.immutable_names = frozenset(immutable_names)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix) or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+        name = posixpath.normpath(unquote(path[len(self.prefix):])).lstrip('/')
+        filename = os.path.realpath(os.path.join(self.root, name))
+        if not filename.startswith(self.root + os.sep) or not os.path.isfile(filename):
+            return self.application(environ, start_response)
+        return self.serve(environ, start_response, name, filename)
+
+    def pick_variant(self, environ, filename):
+        accepted = {
+            part.split(';')[0].strip()
+            for part in environ.get('HTTP_ACCEPT_ENCODING', '').split(',')
+        }
+        for encoding, suffix in self.encodings:
+            if encoding in accepted and os.path.isfile(filename + suffix):
+                return filename + suffix, encoding
+        return filename, None
+
+    def serve(self, environ, start_response, name, filename):
+        served, encoding = self.pick_variant(environ, filename)
+        stat = os.stat(served)
+        etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        content_type, _ = mimetypes.guess_type(filename)
+        headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Cache-Control', IMMUTABLE_CACHE_CONTROL if name in self.immutable_names else DEFAULT_CACHE_CONTROL),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            ('ETag', etag),
+        ]
+        if filename.endswith(COMPRESS_EXTENSIONS):
+            headers.append(('Vary', 'Accept-Encoding'))
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            start_response('304 Not Modified', headers)
+            return []
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        handle = open(served, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(handle, CHUNK_SIZE)
+        return read_chunks(handle)
+
+
+def read_chunks(handle):
+    with handle:
+        while chunk := handle.read(CHUNK_SIZE):
+            yield chunk
@@ -0,0 +1,77 @@
+"""Run maintenance work outside the request/response cycle.
+
+``run_after_commit`` schedules a function once the current transaction
+commits. With ``BLOG_BACKGROUND_TASKS = 'thread'`` (default) it runs on a
+single background worker thread; ``'sync'`` runs it inline, which is what
+tests and management commands want.
+
+``run_once_after_commit`` and ``run_once_in_background`` drop a call that
+is already queued and has not started yet, so a burst of saves of the same
+object does the work once.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='blog-tasks')
+    return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    if getattr(settings, 'BLOG_BACKGROUND_TASKS', 'thread') == 'sync':
+        func(*args, **kwargs)
+    else:
+        get_executor().submit(_run, func, args, kwargs)
+
+
+def run_after_commit(func, *args, **kwargs):
+    transaction.on_commit(lambda: run_in_background(func, *args, **kwargs))
+
+
+_queued = set()
+_queued_lock = threading.Lock()
+
+
+def _run_queued(func, key):
+    with _queued_lock:
+        _queued.discard((func, key))
+    func(key)
+
+
+def run_once_in_background(func, key):
+    """Run ``func(key)`` in the background unless that call is already queued"""
+    with _queued_lock:
+        if (func, key) in _queued:
+            return
+        _queued.add((func, key))
+    run_in_background(_run_queued, func, key)
+
+
+def run_once_after_commit(func, key):
+    # The call only counts as queued once the transaction commits, so a
+    # rollback leaves nothing behind that would block later updates
+    transaction.on_commit(lambda: run_once_in_background(func, key))
@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from blog.fragments import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, template_name, **options):
+    """Render each of ``posts`` with ``template_name`` through the card cache.
+
+    ``options`` (e.g. ``show_tags=True``) are passed to the card template and
+    are part of the cache key.
+    """
+    return mark_safe(render_cards(template_name, posts, **options))
@@ -0,0 +1,44 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from blog.images import derivative_name, get_derivatives, image_formats
+
+register = template.Library()
+
+
+def _srcset(name, widths, image_format):
+    return ', '.join(
+        f'{default_storage.url(derivative_name(name, width, image_format))} {width}w'
+        for width in widths
+    )
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', style='', loading='lazy'):
+    """Render ``image`` as a <picture> offering its resized derivatives.
+
+    Falls back to a plain <img> of the original upload while derivatives are
+    still being generated.
+    """
+    if not image:
+        return ''
+    widths = get_derivatives(image)
+    if not widths:
+        return format_html(
+            '<img src="{}" alt="{}" style="{}" loading="{}" decoding="async">',
+            image.url, alt, style, loading,
+        )
+
+    *preferred, fallback = image_formats()
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((image_format, _srcset(image.name, widths, image_format), sizes) for image_format in preferred),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" style="{}" loading="{}" decoding="async"></picture>',
+        sources,
+        default_storage.url(derivative_name(image.name, widths[-1], fallback)),
+        _srcset(image.name, widths, fallback),
+        sizes, alt, style, loading,
+    )
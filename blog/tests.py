@@ -1,3 +1,277 @@
-from django.test import TestCase
+"""Query-count and query-plan regression tests, and behaviour tests.
 
-# Create your tests here.
+Every named route of ``blog.urls`` and ``accounts.urls`` (and the main
+admin changelists) is requested as an anonymous visitor, a reader and the
+post's author against generated data at two sizes. A page must run the
+same number of queries at both sizes, which catches N+1 patterns, and no
+query may scan the whole ``Post``, ``Comment`` or ``UserActivity`` table
+(``EXPLAIN QUERY PLAN``).
+
+The remaining test cases check behaviour that is easy to break without
+noticing: the URL sanitising of the Markdown renderer and the cursors and
+replies of comment threads.
+"""
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from accounts import urls as accounts_urls
+from accounts.models import UserProfile
+from blog import urls as blog_urls
+
+from .benchmark import seed_benchmark_data
+from .models import Comment, Post
+from .rendering import MARKDOWN, render_content
+
+SMALL = {'posts': 4, 'comments': 6, 'activities': 20, 'users': 6, 'categories': 2, 'tags': 4}
+LARGE = {'posts': 24, 'comments': 60, 'activities': 200, 'users': 30, 'categories': 4, 'tags': 12}
+
+WATCHED_TABLES = {'blog_post', 'blog_comment', 'blog_useractivity'}
+TABLE_ALIAS = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)"?')
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+ADMIN_CHANGELISTS = [
+    'admin:blog_post_changelist',
+    'admin:blog_comment_changelist',
+    'admin:blog_category_changelist',
+    'admin:blog_tag_changelist',
+    'admin:blog_useractivity_changelist',
+    'admin:blog_authorstats_changelist',
+    'admin:blog_dailypoststats_changelist',
+    'admin:accounts_userprofile_changelist',
+]
+
+
+def route_names():
+    names = []
+    for module in (blog_urls, accounts_urls):
+        names += [
+            f'{module.app_name}:{pattern.name}'
+            for pattern in module.urlpatterns
+            if isinstance(pattern, URLPattern) and pattern.name
+        ]
+    return names
+
+
+def full_scans(sql):
+    """Watched tables the plan of ``sql`` reads from start to end"""
+    aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        plan = cursor.fetchall()
+    scanned = set()
+    for row in plan:
+        match = FULL_SCAN.match(row[-1])
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in WATCHED_TABLES:
+                scanned.add(table)
+    return scanned
+
+
+@override_settings(
+    BLOG_ACTIVITY_SINK='sync',
+    BLOG_BACKGROUND_TASKS='sync',
+    BLOG_DATABASE_REPLICAS=[],
+)
+class QueryRegressionTests(TestCase):
+    """Query counts must not grow with the data, and hot tables are never scanned"""
+
+    def seed(self, size):
+        seed_benchmark_data(**size, prefix='test', batch_size=500)
+        self.post = Post.objects.filter(status='published').order_by('-views_count', 'pk').first()
+        self.author = self.post.author
+        self.reader = User.objects.filter(profile__role='reader').order_by('pk').first()
+        self.author.is_staff = self.author.is_superuser = True
+        self.author.save()
+
+    def route_kwargs(self, name):
+        post_slug = {'slug': self.post.slug}
+        if name in ('blog:approve_comment', 'blog:reject_comment', 'blog:delete_comment'):
+            # A fresh comment each time: earlier requests may have deleted one
+            comment = Comment.objects.create(
+                post=self.post, user=self.reader, content='Query regression test', status='pending'
+            )
+            return {'comment_id': comment.pk}
+        return {
+            'blog:post_detail': post_slug,
+            'blog:post_edit': post_slug,
+            'blog:post_delete': post_slug,
+            'blog:add_comment': post_slug,
+            'blog:comment_list': post_slug,
+            'blog:category_posts': {'slug': self.post.category.slug},
+            'blog:tag_posts': {'slug': self.post.tags.order_by('pk').first().slug},
+        }.get(name, {})
+
+    def measure(self, url, user):
+        """Request ``url``; return the number of queries and the full scans"""
+        cache.clear()
+        self.client.logout()
+        if user is not None:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        scans = {}
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if sql.split(' ', 1)[0] in ('SELECT', 'UPDATE', 'DELETE'):
+                for table in full_scans(sql):
+                    scans.setdefault(table, sql)
+        return len(queries), scans
+
+    def walk(self, size, names):
+        """Query counts and scans per (route, visitor) on data of ``size``"""
+        results = {}
+        with transaction.atomic():
+            self.seed(size)
+            visitors = {'anonymous': None, 'reader': self.reader, 'author': self.author}
+            for name in names:
+                for visitor, user in visitors.items():
+                    url = reverse(name, kwargs=self.route_kwargs(name))
+                    results[name, visitor] = self.measure(url, user)
+            transaction.set_rollback(True)
+        return results
+
+    def assert_constant_and_indexed(self, names):
+        small = self.walk(SMALL, names)
+        large = self.walk(LARGE, names)
+        problems = []
+        for key, (count, scans) in large.items():
+            name, visitor = key
+            if count != small[key][0]:
+                problems.append(f'{name} ({visitor}): {small[key][0]} queries with small data, {count} with large')
+            for table, sql in scans.items():
+                problems.append(f'{name} ({visitor}): full scan of {table} in {sql}')
+        self.assertFalse(problems, '\n' + '\n'.join(problems))
+
+    def test_routes(self):
+        names = route_names()
+        # Logging out would end the session the remaining requests reuse
+        names.remove('accounts:logout')
+        names.append('accounts:logout')
+        self.assert_constant_and_indexed(names)
+
+    def test_admin_changelists(self):
+        self.assert_constant_and_indexed(ADMIN_CHANGELISTS)
+
+
+class MarkdownUrlTests(SimpleTestCase):
+    """Links and images with a script scheme are dropped however it is spelled"""
+
+    def assert_dropped(self, source):
+        html = render_content(source, MARKDOWN)
+        self.assertNotIn('href=', html)
+        self.assertNotIn('src=', html)
+
+    def test_plain_and_mixed_case(self):
+        for url in ('javascript:alert(1)', 'JaVaScRiPt:alert(1)', 'VBScript:msgbox(1)', 'data:text/html,x'):
+            with self.subTest(url=url):
+                self.assert_dropped(f'[link]({url}) ![image]({url})')
+
+    def test_character_references(self):
+        for url in (
+            'javascript&#58;alert(1)',
+            '&#106;avascript:alert(1)',
+            '&#x6A;avascript&colon;alert(1)',
+            'java&#x09;script:alert(1)',
+        ):
+            with self.subTest(url=url):
+                self.assert_dropped(f'[link]({url}) ![image]({url})')
+
+    def test_whitespace_and_control_characters(self):
+        for url in ('java\tscript:alert(1)', '\x01javascript:alert(1)', 'java\x00script:alert(1)', 'javascript\x7f:alert(1)'):
+            with self.subTest(url=repr(url)):
+                self.assert_dropped(f'[link]({url}) ![image]({url})')
+
+    def test_safe_urls_are_kept(self):
+        html = render_content(
+            '[a](https://example.com/?a=1&b=2) [b](/post/x/) [c](#top) [d](mailto:me@example.com)', MARKDOWN
+        )
+        for url in ('https://example.com/?a=1&amp;b=2', '/post/x/', '#top', 'mailto:me@example.com'):
+            self.assertIn(f'href="{url}"', html)
+
+
+@override_settings(
+    BLOG_ACTIVITY_SINK='sync',
+    BLOG_BACKGROUND_TASKS='sync',
+    BLOG_DATABASE_REPLICAS=[],
+    BLOG_COMMENTS_PER_PAGE=2,
+    BLOG_COMMENT_REPLIES_SHOWN=1,
+)
+class CommentThreadTests(TestCase):
+    """comment_list pages through threads and replies, and replies land in the right thread"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('thread-author', password='x')
+        cls.reader = User.objects.create_user('thread-reader', password='x')
+        UserProfile.objects.create(user=cls.author, role='author')
+        UserProfile.objects.create(user=cls.reader, role='reader')
+        cls.post = Post.objects.create(
+            title='Threads', content='A post to hang comment threads off. ' * 3,
+            author=cls.author, status='published',
+        )
+        cls.start = timezone.now() - timedelta(days=1)
+
+    def comment(self, minutes, parent=None, status='approved'):
+        comment = Comment.objects.create(
+            post=self.post, user=self.reader, content=f'Comment at {minutes}', parent=parent, status=status
+        )
+        # Several comments share a timestamp so the cursor must break ties on id
+        Comment.objects.filter(pk=comment.pk).update(created_at=self.start + timedelta(minutes=minutes // 2))
+        return comment
+
+    def walk(self, url):
+        """Ids of the comments on every page reached by following more_comments_url"""
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [comment.pk for comment in response.context['comments']]
+            url = response.context['more_comments_url']
+        return seen
+
+    def test_thread_pages_cover_every_approved_thread_once(self):
+        threads = [self.comment(minutes) for minutes in range(7)]
+        self.comment(7, status='pending')
+        self.comment(8, parent=threads[0])
+        newest_first = [comment.pk for comment in reversed(threads)]
+        self.assertEqual(self.walk(reverse('blog:comment_list', kwargs={'slug': self.post.slug})), newest_first)
+
+    def test_reply_pages_continue_after_the_shown_replies(self):
+        thread = self.comment(0)
+        replies = [self.comment(minutes, parent=thread) for minutes in range(1, 6)]
+        self.comment(6, parent=thread, status='rejected')
+
+        response = self.client.get(reverse('blog:comment_list', kwargs={'slug': self.post.slug}))
+        shown = response.context['comments'][0]
+        self.assertEqual([reply.pk for reply in shown.shown_replies], [replies[0].pk])
+        self.assertEqual(self.walk(shown.more_replies_url), [reply.pk for reply in replies[1:]])
+
+    def test_invalid_cursor_is_not_found(self):
+        url = reverse('blog:comment_list', kwargs={'slug': self.post.slug})
+        self.assertEqual(self.client.get(f'{url}?cursor=bogus').status_code, 404)
+
+    def test_every_comment_offers_a_reply(self):
+        thread = self.comment(0)
+        reply = self.comment(1, parent=thread)
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('blog:comment_list', kwargs={'slug': self.post.slug}))
+        for comment in (thread, reply):
+            self.assertContains(response, f'<input type="hidden" name="parent" value="{comment.pk}">', html=True)
+
+    def test_replies_join_the_thread_of_the_comment_answered(self):
+        thread = self.comment(0)
+        reply = self.comment(1, parent=thread)
+        self.client.force_login(self.reader)
+        url = reverse('blog:add_comment', kwargs={'slug': self.post.slug})
+        for parent in (thread, reply):
+            self.client.post(url, {'content': f'Answer to {parent.pk}', 'parent': parent.pk})
+            self.assertEqual(Comment.objects.get(content=f'Answer to {parent.pk}').parent, thread)
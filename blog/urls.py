@@ -11,6 +11,7 @@ urlpatterns = [
     path('post/<slug:slug>/edit/', views.PostUpdateView.as_view(), name='post_edit'),
     path('post/<slug:slug>/delete/', views.PostDeleteView.as_view(), name='post_delete'),
     path('post/<slug:slug>/comment/', views.add_comment, name='add_comment'),
+    path('post/<slug:slug>/comments/', views.comment_list, name='comment_list'),
     path('category/<slug:slug>/', views.CategoryPostsView.as_view(), name='category_posts'),
     path('tag/<slug:slug>/', views.TagPostsView.as_view(), name='tag_posts'),
     
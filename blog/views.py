@@ -5,49 +5,81 @@ from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Max, Q
 from django.core.paginator import Paginator
 from django.http import Http404
-from .models import Post, Category, Tag, Comment, UserActivity
+from .models import Post, Category, Tag, Comment, RelatedPost
+from .activity import record_activity
+from .caching import AnonymousPageCacheMixin, ConditionalGetMixin, get_sidebar, get_search_results
+from .comments import comment_page
+from .counters import record_view
+from .pagination import CursorPaginationMixin
+from .search import get_search_backend, max_results
 from .forms import PostForm, CommentForm, SearchForm
 from accounts.models import UserProfile
 
 
-class HomeView(ListView):
+class HomeView(ConditionalGetMixin, AnonymousPageCacheMixin, CursorPaginationMixin, ListView):
     """Home page with list of published posts"""
     model = Post
     template_name = 'blog/home.html'
     context_object_name = 'posts'
     paginate_by = 6
 
+    def get_page_cache_groups(self):
+        return ['home']
+
     def get_queryset(self):
-        return Post.objects.filter(status='published').prefetch_related('author', 'category', 'tags')
+        return Post.objects.published().cards()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
-        context['popular_tags'] = Tag.objects.annotate(
-            count=Count('posts')
-        ).order_by('-count')[:10]
-        context['popular_posts'] = Post.objects.filter(
-            status='published'
-        ).order_by('-views_count')[:5]
+        context.update(get_sidebar())
         return context
 
 
-class PostDetailView(DetailView):
+class PostDetailView(ConditionalGetMixin, AnonymousPageCacheMixin, DetailView):
     """Detailed view of a single post"""
     model = Post
     template_name = 'blog/post_detail.html'
     slug_field = 'slug'
     context_object_name = 'post'
 
+    def get_page_cache_groups(self):
+        return [f"post:{self.kwargs['slug']}"]
+
+    def get_page_cache_extra(self):
+        return {'post_id': self.object.pk}
+
+    def page_cache_hit(self, extra):
+        # Cached pages still count as views
+        record_view(extra['post_id'])
+
+    def get_validators(self):
+        # Drafts and missing posts go through get() for its permission checks
+        self.validated = Post.objects.filter(
+            slug=self.kwargs['slug'], status='published'
+        ).annotate(
+            last_comment_at=Max('comments__updated_at', filter=Q(comments__status='approved'))
+        ).values('pk', 'updated_at', 'last_comment_at', 'approved_comment_count').first()
+        if self.validated is None:
+            return None
+        last_modified = max(filter(None, [self.validated['updated_at'], self.validated['last_comment_at']]))
+        return last_modified, self.validated['approved_comment_count']
+
+    def not_modified(self):
+        # A 304 is still a view
+        post = Post(pk=self.validated['pk'])
+        record_view(post.pk)
+        if self.request.user.is_authenticated:
+            record_activity(self.request.user, 'view_post', post=post, request=self.request)
+
     def get_queryset(self):
-        return Post.objects.prefetch_related('comments', 'tags', 'author')
+        return Post.objects.select_related('author__profile', 'category').prefetch_related('tags')
 
     def get(self, request, *args, **kwargs):
-        response = super().get(request, *args, **kwargs)
-        post = self.get_object()
+        self.object = post = self.get_object()
         
         # Check if user is authorized to view draft posts
         if post.status == 'draft':
@@ -57,65 +89,56 @@ class PostDetailView(DetailView):
         # Increment view count and record activity
         post.increment_views()
         if request.user.is_authenticated:
-            UserActivity.objects.create(
-                user=request.user,
-                activity_type='view_post',
-                post=post,
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
+            record_activity(request.user, 'view_post', post=post, request=request)
         
-        return response
+        context = self.get_context_data(object=post)
+        return self.render_to_response(context)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
+        post = self.object
         
-        # Get approved comments
-        context['comments'] = post.comments.filter(status='approved')
+        # First page of comment threads; more are loaded by comment_list
+        context['comments'], context['more_comments_url'] = comment_page(post)
         
         # Initialize comment form
         if self.request.user.is_authenticated:
             context['comment_form'] = CommentForm()
         
-        # Get related posts (same category)
-        context['related_posts'] = Post.objects.filter(
-            status='published',
-            category=post.category
-        ).exclude(pk=post.pk)[:3]
+        # Precomputed content-similarity neighbours (see blog.related)
+        context['related_posts'] = [
+            link.related for link in RelatedPost.objects.filter(
+                post=post,
+                related__status='published'
+            ).select_related('related').defer(
+                *(f'related__{field}' for field in Post.CARD_DEFERRED_FIELDS)
+            )[:3]
+        ]
         
         return context
 
-    @staticmethod
-    def get_client_ip(request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
 
-
-class PostSearchView(ListView):
+class PostSearchView(ConditionalGetMixin, CursorPaginationMixin, ListView):
     """Search and filter posts"""
     model = Post
     template_name = 'blog/search.html'
     context_object_name = 'posts'
     paginate_by = 10
 
+    def get_validator_groups(self):
+        # Any change to a public post bumps the search generation
+        return ['search']
+
+    def get_filter_id(self, name):
+        value = self.request.GET.get(name, '')
+        return int(value) if value.isdigit() else None
+
     def get_queryset(self):
-        queryset = Post.objects.filter(status='published')
-        
-        query = self.request.GET.get('query', '')
-        category_id = self.request.GET.get('category', '')
-        tag_id = self.request.GET.get('tag', '')
+        query = self.request.GET.get('query', '').strip()
+        category_id = self.get_filter_id('category')
+        tag_id = self.get_filter_id('tag')
         
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query) |
-                Q(excerpt__icontains=query)
-            )
+        queryset = Post.objects.published()
         
         if category_id:
             queryset = queryset.filter(category_id=category_id)
@@ -123,28 +146,61 @@ class PostSearchView(ListView):
         if tag_id:
             queryset = queryset.filter(tags__id=tag_id)
         
-        return queryset.prefetch_related('author', 'category', 'tags').distinct()
+        if not (query or category_id or tag_id):
+            return queryset.cards()
+        
+        if query:
+            compute = lambda: get_search_backend().search(query, category_id=category_id, tag_id=tag_id)
+        else:
+            compute = lambda: list(
+                queryset.order_by('-published_at', '-id').values_list('pk', flat=True).distinct()[:max_results() + 1]
+            )
+        # Ordered list of matching post ids, cached per (query, category, tag);
+        # posts are loaded per page
+        post_ids = get_search_results(query, category_id, tag_id, compute)
+        self.results_truncated = len(post_ids) > max_results()
+        return post_ids[:max_results()]
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        if isinstance(queryset, list):
+            page.object_list = object_list = self.load_results(list(object_list))
+        return paginator, page, object_list, is_paginated
+
+    def load_results(self, post_ids):
+        posts = Post.objects.cards().in_bulk(post_ids)
+        query = self.request.GET.get('query', '').strip()
+        snippets = get_search_backend().snippets(query, post_ids) if query else {}
+        results = []
+        for post_id in post_ids:
+            if post_id in posts:
+                post = posts[post_id]
+                post.search_snippet = snippets.get(post_id)
+                results.append(post)
+        return results
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search_form'] = SearchForm(self.request.GET)
         context['query'] = self.request.GET.get('query', '')
+        context['results_truncated'] = getattr(self, 'results_truncated', False)
+        context['max_results'] = max_results()
         return context
 
 
-class CategoryPostsView(ListView):
+class CategoryPostsView(ConditionalGetMixin, AnonymousPageCacheMixin, CursorPaginationMixin, ListView):
     """Posts filtered by category"""
     model = Post
     template_name = 'blog/category_posts.html'
     context_object_name = 'posts'
     paginate_by = 10
 
+    def get_page_cache_groups(self):
+        return [f"category:{self.kwargs['slug']}"]
+
     def get_queryset(self):
         self.category = get_object_or_404(Category, slug=self.kwargs['slug'])
-        return Post.objects.filter(
-            category=self.category,
-            status='published'
-        ).prefetch_related('author', 'tags')
+        return Post.objects.published().filter(category=self.category).cards()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -152,16 +208,19 @@ class CategoryPostsView(ListView):
         return context
 
 
-class TagPostsView(ListView):
+class TagPostsView(ConditionalGetMixin, AnonymousPageCacheMixin, CursorPaginationMixin, ListView):
     """Posts filtered by tag"""
     model = Post
     template_name = 'blog/tag_posts.html'
     context_object_name = 'posts'
     paginate_by = 10
 
+    def get_page_cache_groups(self):
+        return [f"tag:{self.kwargs['slug']}"]
+
     def get_queryset(self):
         self.tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
-        return self.tag.posts.filter(status='published').prefetch_related('author', 'category')
+        return self.tag.posts.published().cards(tags=False)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -182,15 +241,13 @@ class PostCreateView(CreateView):
     def form_valid(self, form):
         post = form.save(commit=False)
         post.author = self.request.user
-        post.save()
-        form.save_m2m()  # Save many-to-many relationships
+        # One transaction with the rows the post_save receivers write (outbox)
+        with transaction.atomic():
+            post.save()
+            form.save_m2m()  # Save many-to-many relationships
         
         # Record user activity
-        UserActivity.objects.create(
-            user=self.request.user,
-            activity_type='create_post',
-            post=post
-        )
+        record_activity(self.request.user, 'create_post', post=post)
         
         messages.success(self.request, 'Post created successfully!')
         return redirect(post.get_absolute_url())
@@ -218,14 +275,11 @@ class PostUpdateView(UpdateView):
         return Post.objects.filter(author=self.request.user)
 
     def form_valid(self, form):
-        post = form.save()
+        with transaction.atomic():
+            post = form.save()
         
         # Record user activity
-        UserActivity.objects.create(
-            user=self.request.user,
-            activity_type='edit_post',
-            post=post
-        )
+        record_activity(self.request.user, 'edit_post', post=post)
         
         messages.success(self.request, 'Post updated successfully!')
         return redirect(post.get_absolute_url())
@@ -249,18 +303,12 @@ class PostDeleteView(DeleteView):
     def get_queryset(self):
         return Post.objects.filter(author=self.request.user)
 
-    def delete(self, request, *args, **kwargs):
-        post = self.get_object()
-        
-        # Record user activity
-        UserActivity.objects.create(
-            user=request.user,
-            activity_type='delete_post',
-            post=post
-        )
+    def form_valid(self, form):
+        # Record user activity; the post row is gone by the time it is written
+        record_activity(self.request.user, 'delete_post')
         
-        messages.success(request, 'Post deleted successfully!')
-        return super().delete(request, *args, **kwargs)
+        messages.success(self.request, 'Post deleted successfully!')
+        return super().form_valid(form)
 
     def dispatch(self, request, *args, **kwargs):
         post = self.get_object()
@@ -276,7 +324,7 @@ def add_comment(request, slug):
     post = get_object_or_404(Post, slug=slug, status='published')
     
     if request.method == 'POST':
-        form = CommentForm(request.POST)
+        form = CommentForm(request.POST, post=post)
         if form.is_valid():
             comment = form.save(commit=False)
             comment.post = post
@@ -284,11 +332,7 @@ def add_comment(request, slug):
             comment.save()
             
             # Record user activity
-            UserActivity.objects.create(
-                user=request.user,
-                activity_type='comment_post',
-                post=post
-            )
+            record_activity(request.user, 'comment_post', post=post)
             
             messages.success(request, 'Your comment has been submitted for moderation.')
             return redirect(post.get_absolute_url())
@@ -296,6 +340,23 @@ def add_comment(request, slug):
     return redirect(post.get_absolute_url())
 
 
+def comment_list(request, slug):
+    """Further comment threads, or replies to one thread, as an HTML fragment"""
+    post = get_object_or_404(Post, slug=slug, status='published')
+    parent = None
+    if request.GET.get('parent', '').isdigit():
+        parent = get_object_or_404(
+            Comment, pk=request.GET['parent'], post=post, parent__isnull=True, status='approved'
+        )
+    comments, more_url = comment_page(post, request.GET.get('cursor'), parent)
+    template_name = 'blog/includes/comment_replies.html' if parent else 'blog/includes/comment_list.html'
+    return render(request, template_name, {
+        'post': post,
+        'comments': comments,
+        'more_comments_url': more_url,
+    })
+
+
 @login_required
 def approve_comment(request, comment_id):
     """Approve a comment (moderator only)"""
@@ -50,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole middleware stack
+    'blog.middleware.UserActivityMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +61,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     
     # Custom middleware
-    'blog.middleware.UserActivityMiddleware',
+    'blog.middleware.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'blog_project.urls'
@@ -91,9 +93,42 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections (and their page cache) across requests
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Background writers (activity sink, related posts) share the file
+            # with requests: take the write lock at BEGIN and wait for it, rather
+            # than failing with "database is locked" when upgrading a read lock.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# Pragmas applied to every SQLite connection (see blog.sqlite):
+# 'production' (WAL, synchronous=NORMAL, mmap, larger page cache) or
+# 'default' (SQLite's stock rollback journal)
+BLOG_SQLITE_PROFILE = 'production'
+
+# Read replicas (see blog.routers). Add replica aliases to DATABASES and
+# list them here, e.g. a local file copy refreshed by
+# 'manage.py sync_sqlite_replicas':
+#
+#     DATABASES['replica'] = {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': BASE_DIR / 'db.replica.sqlite3',
+#         # Reconnect every request to pick up the refreshed copy
+#         'CONN_MAX_AGE': 0,
+#         'TEST': {'MIRROR': 'default'},
+#     }
+#     BLOG_DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['blog.routers.ReplicaRouter']
+BLOG_DATABASE_REPLICAS = []
+# After a request writes, the client reads from the primary for this long
+BLOG_REPLICA_PIN_SECONDS = 15
+BLOG_REPLICA_PIN_COOKIE = 'pin_primary'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,6 +168,28 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 STATICFILES_DIRS = []
 
+# Content-hashed file names plus .gz/.br copies (.br needs the brotli
+# package). Pages then fail until `manage.py collectstatic` has written the
+# manifest, so only turn this on where collectstatic runs on every deploy.
+BLOG_HASHED_STATIC = False
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'blog.staticfiles.CompressedManifestStaticFilesStorage'
+            if BLOG_HASHED_STATIC and not DEBUG
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
+# Serve STATIC_ROOT from the WSGI application itself, for hosts without a
+# web server or proxy in front of Django
+BLOG_SERVE_STATIC = False
+
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -151,6 +208,78 @@ LOGOUT_REDIRECT_URL = 'blog:home'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caching
+# LocMemCache is per process; point this at Redis or Memcached when running
+# several workers so page invalidation reaches all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'kblog',
+    }
+}
+
+# Seconds anonymous post and list pages stay cached; 0 disables the page cache
+BLOG_PAGE_CACHE_TIMEOUT = 300
+
+# Seconds a search's ordered result ids stay cached; 0 disables the cache
+BLOG_SEARCH_CACHE_TIMEOUT = 600
+# Searches list at most this many results, best matches first
+BLOG_SEARCH_MAX_RESULTS = 1000
+
+# Seconds before the home sidebar (categories, popular tags and posts) is rebuilt
+BLOG_SIDEBAR_TIMEOUT = 600
+
+# Seconds a rendered post card stays cached (see blog.fragments); 0 disables
+BLOG_CARD_CACHE_TIMEOUT = 3600
+# Bump when card templates change so cached cards are not reused
+BLOG_CARD_TEMPLATE_VERSION = 1
+
+# Page post lists with opaque cursors instead of ?page=N (no OFFSET or COUNT)
+BLOG_CURSOR_PAGINATION = False
+
+# Comment threads on a post page (see blog.comments); more load on demand
+BLOG_COMMENTS_PER_PAGE = 20
+BLOG_COMMENT_REPLIES_SHOWN = 3
+
+# Post view counting
+# 'local' buffers views per worker; 'cache' buffers them in the cache below so
+# `manage.py flush_view_counts` can drain them from any process.
+BLOG_VIEW_COUNT_BACKEND = 'local'
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 30  # seconds
+BLOG_VIEW_COUNT_CACHE = 'default'
+
+# Serve author dashboard totals from maintained AuthorStats rows instead of
+# aggregating the author's posts on every dashboard view
+BLOG_AUTHOR_STATS = True
+
+# Request instrumentation (see blog.instrumentation)
+BLOG_SERVER_TIMING = True
+# Requests slower (ms) or with more queries than this are logged
+BLOG_REQUEST_TIME_BUDGET = 500
+BLOG_REQUEST_QUERY_BUDGET = 30
+# Per-view overrides, e.g. {'blog:search': {'time': 800, 'queries': 10}}
+BLOG_REQUEST_BUDGETS = {}
+
+# User activity tracking
+# 'queued' writes activity rows in batches from a background thread;
+# 'sync' writes them inside the request (use this for tests).
+BLOG_ACTIVITY_SINK = 'queued'
+BLOG_ACTIVITY_BATCH_SIZE = 100
+BLOG_ACTIVITY_FLUSH_INTERVAL = 2.0  # seconds
+BLOG_ACTIVITY_MAX_QUEUE_SIZE = 10000
+# Activity older than this is moved to gzipped JSON Lines files by
+# 'manage.py prune_activity' (see blog.retention)
+BLOG_ACTIVITY_RETENTION_DAYS = 90
+BLOG_ACTIVITY_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive', 'activity')
+
+# Post-save maintenance such as related-post updates
+# 'thread' runs it on a background worker thread; 'sync' runs it inline.
+BLOG_BACKGROUND_TASKS = 'thread'
+
+# Resized copies of featured images and avatars (see blog.images)
+BLOG_IMAGE_WIDTHS = (160, 320, 640, 1280)  # pixels
+BLOG_IMAGE_QUALITY = 80
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -9,8 +9,21 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_project.settings')
 
 application = get_wsgi_application()
+
+if getattr(settings, 'BLOG_SERVE_STATIC', False):
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    from blog.staticfiles import StaticFilesApplication
+
+    application = StaticFilesApplication(
+        application,
+        settings.STATIC_ROOT,
+        settings.STATIC_URL,
+        immutable_names=getattr(staticfiles_storage, 'hashed_files', {}).values(),
+    )